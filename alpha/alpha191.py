@@ -1,85 +1,109 @@
 import numpy as np
 from numpy import log
-from scipy.stats import rankdata
 from alphas import Alphas
+from memo import OperatorCache, memoized
+from kernels import RollingMoments, ts_rank, ts_prod, reg_beta, decay_linear, wma, low_day, high_day, ts_count, returns
+from formula import compile_formulas
+import inspect
+import re
+import os
+import time
 from datas import *
 
+@memoized
 def Log(sr):
     #自然对数函数
     return np.log(sr)
 
+@memoized
 def Rank(sr):
     #列-升序排序并转化成百分比
     return sr.rank(axis=1, method='min', pct=True)
 
+@memoized
 def Delta(sr,period):
     #period日差分
     return sr.diff(period)
 
+@memoized
 def Delay(sr,period):
     #period阶滞后项
     return sr.shift(period)
 
+@memoized
 def Corr(x,y,window):
     #window日滚动相关系数
     #当一个变量值为常量，另一个变量值可变化时，此时无法计算相关度，使用0 进行填充
-    r = x.rolling(window).corr(y).fillna(0)
-    #同时将起始 window-1 个窗口赋值为空
-    r.iloc[:(window-1), :] = None
-    return r
+    #起始 window-1 个窗口为空
+    return RollingMoments(x, window, y).corr(fill=0)
 
+@memoized
 def Cov(x,y,window):
     #window日滚动协方差
-    return x.rolling(window).cov(y)
+    return RollingMoments(x, window, y).cov()
 
+@memoized
 def Sum(sr,window):
     #window日滚动求和
     return sr.rolling(window).sum()
 
+@memoized
 def Prod(sr,window):
     #window日滚动求乘积
-    return sr.rolling(window).apply(lambda x: np.prod(x))
+    return ts_prod(sr, window)
 
+@memoized
 def Mean(sr,window):
     #window日滚动求均值
-    return sr.rolling(window).mean()
+    return RollingMoments(sr, window).mean()
 
+@memoized
 def Std(sr,window):
     #window日滚动求标准差
-    return sr.rolling(window).std()
+    return RollingMoments(sr, window).std()
 
+@memoized
 def Tsrank(sr, window):
     #window日序列末尾值的顺位
-    return sr.rolling(window).apply(lambda x: rankdata(x)[-1])
+    return ts_rank(sr, window)
                
+@memoized
 def Tsmax(sr, window):
     #window日滚动求最大值    
     return sr.rolling(window).max()
 
+@memoized
 def Tsmin(sr, window):
     #window日滚动求最小值    
     return sr.rolling(window).min()
 
+@memoized
 def Sign(sr):
     #符号函数
     return np.sign(sr)
 
+@memoized
 def Max(sr1,sr2):
     return np.maximum(sr1, sr2)
 
+@memoized
 def Min(sr1,sr2):
     return np.minimum(sr1, sr2)
 
+@memoized
 def Rowmax(sr):
     return sr.max(axis=1)
 
+@memoized
 def Rowmin(sr):
     return sr.min(axis=1)
 
+@memoized
 def Sma(sr,n,m):
     #sma均值
     return sr.ewm(alpha=m/n, adjust=False).mean()
 
+@memoized
 def Abs(sr):
     #求绝对值
     return sr.abs()
@@ -88,41 +112,59 @@ def Sequence(n):
     #生成 1~n 的等差序列
     return np.arange(1,n+1)
 
+@memoized
 def Regbeta(sr,x):
-    window = len(x)
-    return sr.rolling(window).apply(lambda y: np.polyfit(x, y, deg=1)[0])
+    #对序列 x 的滚动回归斜率
+    return reg_beta(sr, x)
 
+@memoized
 def Decaylinear(sr, window):  
-    weights = np.array(range(1, window+1))
-    sum_weights = np.sum(weights)
-    return sr.rolling(window).apply(lambda x: np.sum(weights*x) / sum_weights)
+    #线性衰减加权均值
+    return decay_linear(sr, window)
 
+@memoized
 def Lowday(sr,window):
-    return sr.rolling(window).apply(lambda x: len(x) - x.values.argmin())
+    return low_day(sr, window)
 
+@memoized
 def Highday(sr,window):
-    return sr.rolling(window).apply(lambda x: len(x) - x.values.argmax())
+    return high_day(sr, window)
 
+@memoized
 def Wma(sr,window):
-    weights = np.array(range(window-1,-1, -1))
-    weights = np.power(0.9,weights)
-    sum_weights = np.sum(weights)
-
-    return sr.rolling(window).apply(lambda x: np.sum(weights*x) / sum_weights)
+    #0.9 指数衰减加权均值
+    return wma(sr, window)
 
+@memoized
 def Count(cond,window):
-    return cond.rolling(window).apply(lambda x: x.sum())
+    return ts_count(cond, window)
 
+@memoized
 def Sumif(sr,window,cond):
-    sr[~cond] = 0
-    return sr.rolling(window).sum()
+    #不修改输入（输入可能是缓存中的共享结果）
+    return sr.where(cond, 0).rolling(window).sum()
 
 def Returns(df):
-    return df.rolling(2).apply(lambda x: x.iloc[-1] / x.iloc[0]) - 1
+    return returns(df)
+
+# 公式函数名 -> 算子，供 formula 编译出的执行计划调用
+FORMULA_FUNCTIONS = {
+    'RANK': Rank, 'LOG': Log, 'ABS': Abs, 'SIGN': Sign, 'SEQUENCE': Sequence,
+    'DELAY': Delay, 'DELTA': Delta, 'SUM': Sum, 'MEAN': Mean, 'STD': Std, 'PROD': Prod,
+    'TSMAX': Tsmax, 'TSMIN': Tsmin, 'TSRANK': Tsrank, 'MAX': Max, 'MIN': Min,
+    'DECAYLINEAR': Decaylinear, 'WMA': Wma, 'LOWDAY': Lowday, 'HIGHDAY': Highday,
+    'COUNT': Count, 'SUMIF': Sumif, 'REGBETA': Regbeta, 'SMA': Sma,
+    'CORR': Corr, 'COV': Cov,
+}
+
+# 因子方法中第一行 ### 注释为公式原文
+_FORMULA_LINE = re.compile(r"^\s*#{3,}\s*(.*?)\s*#*\s*$", re.M)
 
 
 class Alphas191(Alphas):
-    def __init__(self, df_data):
+    def __init__(self, df_data, cache_bytes=1 << 30):
+        # 算子中间结果缓存，compute() 计算的因子之间共享
+        self.cache = OperatorCache(cache_bytes)
         self.open = df_data['open'] # 开盘价
         self.high = df_data['high'] # 最高价
         self.low = df_data['low'] # 最低价
@@ -136,6 +178,71 @@ class Alphas191(Alphas):
         self.benchmark_open = df_data['benchmark_open']#指数开盘价series
         self.benchmark_close = df_data['benchmark_close']#指数收盘价series
         # self.value = df_data['value']#公司总市值
+        self.cache.register(self.open, self.high, self.low, self.close, self.volume, self.returns, self.vwap,
+                            self.close_prev, self.amount, self.benchmark_open, self.benchmark_close)
+
+    def formula_fields(self):
+        # 公式中的字段名 -> 行情面板
+        return {
+            'OPEN': self.open, 'HIGH': self.high, 'LOW': self.low, 'CLOSE': self.close,
+            'VOLUME': self.volume, 'VWAP': self.vwap, 'AMOUNT': self.amount, 'RET': self.returns,
+            'BANCHMARKINDEXOPEN': self.benchmark_open, 'BANCHMARKINDEXCLOSE': self.benchmark_close,
+        }
+
+    @classmethod
+    def formulas(cls):
+        """
+        各因子方法注释中的公式原文 {因子名: 公式}，没有公式注释的因子不在其中
+        """
+        formulas = {}
+        for name in cls.get_alpha_methods(cls):
+            match = _FORMULA_LINE.search(inspect.getsource(getattr(cls, name)))
+            if match and match.group(1):
+                formulas[name] = match.group(1)
+        return formulas
+
+    @classmethod
+    def compile(cls, formulas=None):
+        """
+        把公式编译成一个执行计划，所有公式共享相同的子表达式
+        :return: (Plan, {因子名: 无法编译的原因})
+        """
+        return compile_formulas(cls.formulas() if formulas is None else formulas)
+
+    def compute_formulas(self, formulas=None, plan=None):
+        """
+        按执行计划一次算出所有公式，逐个产出 (因子名, 结果)
+        formulas: {名称: 公式}，默认为本类全部因子的公式；无法编译的公式被跳过
+        """
+        if plan is None:
+            plan, errors = self.compile(formulas)
+            for name, error in errors.items():
+                print(f"{name}: {error}")
+        return plan.run(self.formula_fields(), FORMULA_FUNCTIONS)
+
+    @classmethod
+    def generate_alphas_compiled(cls, year, list_assets, benchmark):
+        """
+        由公式编译的执行计划一次计算全部因子；无法编译的因子退回到对应的 Python 方法
+        """
+        t1 = time.time()
+        stock = cls(cls.get_stocks_data(year, list_assets, benchmark))
+        path = f'alphas/{cls.__name__}/{year}'
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        plan, errors = cls.compile()
+        summary = plan.summary()
+        print(f"Compiled {summary['formulas']} formulas: {plan.tree_size} expression nodes -> {summary['nodes']} distinct operations")
+        for name, value in stock.compute_formulas(plan=plan):
+            value.to_csv(f'{path}/{name}.csv')
+
+        fallback = [m for m in cls.get_alpha_methods(cls) if m not in plan.outputs]
+        for m in fallback:
+            cls.calc_alpha(f'{path}/{m}.csv', m, stock)
+        t2 = time.time()
+        print(f"Fallback to methods: {', '.join(fallback)}")
+        print(f"Total time {t2-t1}")
 
     def alpha001(self): #平均1751个数据
         ##### (-1 * CORR(RANK(DELTA(LOG(VOLUME), 1)), RANK(((CLOSE - OPEN) / OPEN)), 6))#### 
@@ -1237,6 +1344,9 @@ if __name__ == '__main__':
     ################ 计算所有 #################    
     Alphas191.generate_alphas(year, list_assets,"sh000300")
 
+    ################ 按公式编译的执行计划计算所有 #################
+    # Alphas191.generate_alphas_compiled(year, list_assets, "sh000300")
+
     ################ 计算单个 #################
     # ret = Alphas191.generate_alpha_single('alpha170', year, list_assets, "sh000300", True)
     # print(ret)
\ No newline at end of file
@@ -1,19 +1,63 @@
 import pandas as pd
+import numpy as np
 from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
 from datas import *
 import os
+import hashlib
+import json
 import traceback
 import time
 
+# 股票面板缓存目录，根目录与项目其余部分一致（OMNIALPHA_CACHE_DIR）
+PANEL_CACHE_DIR = os.path.join(os.environ.get('OMNIALPHA_CACHE_DIR', '.omnialpha_cache'), 'alpha_panels')
+
+# 面板中来自股票数据的字段，基准字段 benchmark_open / benchmark_close 附在其后
+PANEL_FIELDS = ["open", "close", "high", "low", "volume", "amount", 'vwap', "pctChg", 'turnover']
+
+COLUMN_NAMES = {
+    "交易日期": "date",
+    "股票代码": "code",
+    "开盘价": "open",
+    "收盘价": "close",
+    "最高价": "high",
+    "最低价": "low",
+    "成交量": "volume",
+    "成交额": "amount",
+    "涨跌幅": "pctChg",
+    "换手率": "turnover"}
+
+# 进程池中每个子进程的因子计算对象，由 _init_worker 设置一次，供其处理的所有因子共用
+_worker_stock = None
+
+def _init_worker(stock):
+    global _worker_stock
+    _worker_stock = stock
+
+def _read_asset(file_path, asset, start_time, end_time):
+    # 读取单只股票在 [start_time, end_time] 内的日线
+    df = pd.read_csv(file_path)
+    df = df[(df['date'] >= start_time) & (df['date'] <= end_time)]
+    return df.assign(asset=asset)
+
 class Alphas(object):
     def __init__(self, df_data):
         pass
 
+    def compute(self, alpha_name):
+        # 计算单个因子；实例带有算子缓存(cache)时，中间结果在因子之间共享
+        factor = getattr(self, alpha_name)
+        cache = getattr(self, 'cache', None)
+        if cache is None:
+            return factor()
+        with cache.activate():
+            return factor()
+
     @classmethod
-    def calc_alpha(cls, path, func, data):
+    def calc_alpha(cls, path, alpha_name, data=None):
         try:
             t1 = time.time()
-            res = func(data)
+            res = (data if data is not None else _worker_stock).compute(alpha_name)
             res.to_csv(path)
             t2 = time.time()
             print(f"Factory {os.path.splitext(os.path.basename(path))[0]} time {t2-t1}")
@@ -22,67 +66,87 @@ class Alphas(object):
             # traceback.print_exc()
 
     @classmethod
-    def get_stocks_data(cls, year, list_assets, benchmark):
+    def get_stocks_data(cls, year, list_assets, benchmark, use_cache=True, workers=8):
+        """
+        (日期 × (字段, 股票)) 面板
+        多线程读取各股票 CSV 后一次拼接、一次透视；结果按 (年份, 股票池, 基准, 源文件版本) 缓存为 parquet，
+        源文件未变时直接读取缓存
+        """
         yer = int(year)
         start_time = f'{yer-1}-01-01'
         end_time = f'{yer+1}-01-01'
 
         data_path = 'datas'
-        df_all = pd.DataFrame()
+        files = {}
+        for asset in list_assets:
+            file_path = f'{data_path}/{asset}.csv'
+            if os.path.exists(file_path):
+                files[asset] = file_path
+
+        cache_path = cls.get_panel_cache_path(year, files, benchmark) if use_cache else None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                return pd.read_parquet(cache_path)
+            except Exception as e:
+                print(f"Error reading panel cache {cache_path}: {e}")
 
         # 获取基准数据（如沪深300指数）
-        df_benchmark = cls.get_benchmark(year, benchmark)
-        benchmark_open = df_benchmark.set_index('date')['open']
-        benchmark_close = df_benchmark.set_index('date')['close']
+        df_benchmark = cls.get_benchmark(year, benchmark).set_index('date')
 
         # 读取股票数据
-        for asset in list_assets:
+        def load(asset):
             try:
-                file_path = f'{data_path}/{asset}.csv'
-                if not os.path.exists(file_path):
-                    continue
-                
-                df = pd.read_csv(file_path)
-                df = df[(df['date'] >= start_time) & (df['date'] <= end_time)]
-                df['asset'] = asset
-                
-                # 关联基准指数数据
-                df = df.set_index('date')
-                df['benchmark_open'] = benchmark_open
-                df['benchmark_close'] = benchmark_close
-                df = df.reset_index()
-                
-                df_all = pd.concat([df_all, df], ignore_index=True)
+                return _read_asset(files[asset], asset, start_time, end_time)
             except Exception as e:
                 print(f"Error loading {asset}: {e}")
-                continue
+                return None
+
+        with ThreadPoolExecutor(workers) as pool:
+            frames = [df for df in pool.map(load, files) if df is not None]
 
-        if df_all.empty:
+        if not frames:
             raise ValueError("No stock data loaded!")
 
-        # 重命名列以匹配因子计算需要
-        df_all = df_all.rename(columns={
-            "交易日期": "date",
-            "股票代码": "code",
-            "开盘价": "open",
-            "收盘价": "close",
-            "最高价": "high",
-            "最低价": "low",
-            "成交量": "volume",
-            "成交额": "amount",
-            "涨跌幅": "pctChg",
-            "换手率": "turnover"})
-        
+        # 只拼接一次；重命名列以匹配因子计算需要
+        df_all = pd.concat(frames, ignore_index=True).rename(columns=COLUMN_NAMES)
+
         # 计算平均成交价 vwap
         df_all['vwap'] = df_all['amount'] / (df_all['volume'] * 100)
         df_all['turnover'] = df_all['turnover'] / 100
 
-        # 返回计算因子需要的列
-        df_all = df_all.reset_index(drop=True)
-        df_all = df_all[['asset', 'date', "open", "close", "high", "low", "volume", "amount", 'vwap', "pctChg", 'turnover', 'benchmark_open', 'benchmark_close']]
-        df_all = df_all[df_all['asset'].notnull()]
-        
-        return df_all.pivot(index='date', columns='asset')
+        panel = df_all.pivot(index='date', columns='asset', values=PANEL_FIELDS)
+
+        # 基准按日期对齐一次再广播到各股票，股票当天没有数据的位置为空
+        assets = panel[PANEL_FIELDS[0]].columns
+        present = np.zeros((len(panel.index), len(assets)), dtype=bool)
+        present[panel.index.get_indexer(df_all['date']), assets.get_indexer(df_all['asset'])] = True
+        benchmarks = {
+            f'benchmark_{name}': pd.DataFrame(
+                np.where(present, df_benchmark[name].reindex(panel.index).to_numpy()[:, None], np.nan),
+                index=panel.index, columns=assets)
+            for name in ('open', 'close')
+        }
+        panel = pd.concat([panel, pd.concat(benchmarks, axis=1, names=panel.columns.names)], axis=1)
+
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                # 先写临时文件，中断时不会留下不完整的缓存
+                panel.to_parquet(cache_path + '.tmp')
+                os.replace(cache_path + '.tmp', cache_path)
+            except Exception as e:
+                print(f"Error writing panel cache {cache_path}: {e}")
+
+        return panel
+
+    @classmethod
+    def get_panel_cache_path(cls, year, files, benchmark):
+        # 键包含每个源文件的大小与修改时间，数据更新后缓存自动失效
+        sources = sorted(files.items()) + [(benchmark, f'index/{benchmark}.csv')]
+        stats = [(name, path, os.path.getsize(path), os.path.getmtime(path)) if os.path.exists(path) else (name, path)
+                 for name, path in sources]
+        key = hashlib.sha1(json.dumps([str(year), stats]).encode('utf-8')).hexdigest()
+        return os.path.join(PANEL_CACHE_DIR, f'{year}_{benchmark}_{key[:16]}.parquet')
 
     @classmethod
     def get_benchmark(cls, year, code):
@@ -107,12 +171,12 @@ class Alphas(object):
         # 实例化因子计算的对象
         stock = cls(stock_data)
 
-        factor = getattr(cls, alpha_name)
+        factor = getattr(cls, alpha_name, None)
         if factor is None:
             print('alpha name is error!!!')
             return None
         
-        alpha_data = factor(stock)
+        alpha_data = stock.compute(alpha_name)
 
         if need_save:
             path = f'alphas/{cls.__name__}/{year}'
@@ -123,7 +187,11 @@ class Alphas(object):
         return alpha_data
 
     @classmethod
-    def generate_alphas(cls, year, list_assets, benchmark):
+    def generate_alphas(cls, year, list_assets, benchmark, processes=None):
+        """
+        processes: 进程数，默认 CPU 核数。每个进程只接收一次计算对象，其算子缓存在该进程计算的
+        所有因子间共享；processes=1 时在当前进程计算，每个不同的中间结果在整次运行中只算一次
+        """
         t1 = time.time()
         # 获取计算因子所需股票数据
         stock_data = cls.get_stocks_data(year, list_assets, benchmark)
@@ -138,22 +206,25 @@ class Alphas(object):
         if not os.path.isdir(path):
             os.makedirs(path)
 
-        # 创建线程池
-        count = os.cpu_count()
-        pool = Pool(count)
-
         # 获取所有因子计算的方法
         methods = cls.get_alpha_methods(cls)
 
-        # 在线程池中计算所有alpha
-        for m in methods:
-            factor = getattr(cls, m)
-            try:
-                pool.apply_async(cls.calc_alpha, (f'{path}/{m}.csv', factor, stock))
-            except Exception as e:
-                traceback.print_exc()
-
-        pool.close()
-        pool.join()
+        count = processes or os.cpu_count()
+        if count == 1:
+            for m in methods:
+                cls.calc_alpha(f'{path}/{m}.csv', m, stock)
+        else:
+            # 创建进程池，计算对象只在进程启动时传递一次
+            pool = Pool(count, initializer=_init_worker, initargs=(stock,))
+
+            # 在进程池中计算所有alpha
+            for m in methods:
+                try:
+                    pool.apply_async(cls.calc_alpha, (f'{path}/{m}.csv', m))
+                except Exception as e:
+                    traceback.print_exc()
+
+            pool.close()
+            pool.join()
         t2 = time.time()
         print(f"Total time {t2-t1}")
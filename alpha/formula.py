@@ -0,0 +1,432 @@
+"""
+国泰君安 191 因子公式语言的解析与编译
+公式文本 -> 语法树 -> 表达式 DAG（相同子表达式合并、常量折叠）-> 执行计划
+
+多个公式编译进同一个 Compiler 时共享节点，执行计划按拓扑顺序把每个不同的中间结果只计算一次，
+并在最后一次使用后释放。算子由调用方按函数名提供（见 alpha191.FORMULA_FUNCTIONS）。
+
+    compiler = Compiler()
+    plan = Plan({'a1': compiler.compile('RANK(DELTA(CLOSE,3))'), ...})
+    for name, value in plan.run(fields, functions): ...
+"""
+import re
+import numpy as np
+import pandas as pd
+
+
+class FormulaError(ValueError):
+    pass
+
+
+# 公式中出现的笔误与同义写法
+ALIASES = {
+    'HGIH': 'HIGH',
+    'VOL': 'VOLUME',
+    'DELAT': 'DELTA',
+    'COVIANCE': 'COV',
+    'COVARIANCE': 'COV',
+    'MA': 'MEAN',
+}
+
+# 行情字段，由调用方在 run() 时提供
+FIELDS = ('OPEN', 'HIGH', 'LOW', 'CLOSE', 'VOLUME', 'VWAP', 'AMOUNT', 'RET',
+          'BANCHMARKINDEXOPEN', 'BANCHMARKINDEXCLOSE')
+
+# 公式说明中定义的中间变量
+MACROS = {
+    'DTM': '(OPEN<=DELAY(OPEN,1)?0:MAX((HIGH-OPEN),(OPEN-DELAY(OPEN,1))))',
+    'DBM': '(OPEN>=DELAY(OPEN,1)?0:MAX((OPEN-LOW),(OPEN-DELAY(OPEN,1))))',
+    'TR': 'MAX(MAX(HIGH-LOW,ABS(HIGH-DELAY(CLOSE,1))),ABS(LOW-DELAY(CLOSE,1)))',
+    'HD': 'HIGH-DELAY(HIGH,1)',
+    'LD': 'DELAY(LOW,1)-LOW',
+}
+
+# 函数 -> (参数个数, 必须是常量的参数位置)
+FUNCTIONS = {
+    'RANK': (1, ()),
+    'LOG': (1, ()),
+    'ABS': (1, ()),
+    'SIGN': (1, ()),
+    'SEQUENCE': (1, (0,)),
+    'DELAY': (2, (1,)),
+    'DELTA': (2, (1,)),
+    'SUM': (2, (1,)),
+    'MEAN': (2, (1,)),
+    'STD': (2, (1,)),
+    'TSMAX': (2, (1,)),
+    'TSMIN': (2, (1,)),
+    'TSRANK': (2, (1,)),
+    'DECAYLINEAR': (2, (1,)),
+    'WMA': (2, (1,)),
+    'LOWDAY': (2, (1,)),
+    'HIGHDAY': (2, (1,)),
+    'PROD': (2, (1,)),
+    'COUNT': (2, (1,)),
+    'REGBETA': (2, ()),
+    'MAX': (2, ()),
+    'MIN': (2, ()),
+    'CORR': (3, (2,)),
+    'COV': (3, (2,)),
+    'SMA': (3, (1, 2)),
+    'SUMIF': (3, (1,)),
+}
+
+_BINARY = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a / b,
+    '^': lambda a, b: a ** b,
+    '<': lambda a, b: a < b,
+    '>': lambda a, b: a > b,
+    '<=': lambda a, b: a <= b,
+    '>=': lambda a, b: a >= b,
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '&': lambda a, b: a & b,
+    '|': lambda a, b: a | b,
+}
+
+# 交换律成立（浮点下结果逐位相同）的运算，参数按节点编号排序后再合并
+_COMMUTATIVE = {'+', '*', '==', '!=', '&', '|', 'MAX', 'MIN'}
+
+_TOKEN = re.compile(r"\s*(?:(\d+\.?\d*|\.\d+)|([A-Za-z_][A-Za-z_0-9]*)|(<=|>=|==|!=|<>|&&|\|\||\*\*|[-+*/^<>=()?:,&|]))")
+
+_NORMALIZE = str.maketrans({'？': '?', '：': ':', '，': ',', '（': '(', '）': ')', '–': '-', '—': '-'})
+
+
+def tokenize(text):
+    text = text.translate(_NORMALIZE)
+    text = re.sub(r"\bself\.", "", text)
+    tokens, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            raise FormulaError(f"Unexpected character {text[pos:].lstrip()[:1]!r} at {pos}")
+        number, name, op = match.groups()
+        if number is not None:
+            tokens.append(('num', float(number) if '.' in number else int(number)))
+        elif name is not None:
+            name = name.upper()
+            if name in ('AND', 'OR'):
+                tokens.append(('op', '&' if name == 'AND' else '|'))
+            else:
+                tokens.append(('name', ALIASES.get(name, name)))
+        else:
+            op = {'&&': '&', '||': '|', '**': '^', '=': '==', '<>': '!='}.get(op, op)
+            tokens.append(('op', op))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    递归下降解析，优先级从低到高：
+    ?: < | < & < 比较 < + - < * / < 一元 + - < ^
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, *ops):
+        kind, value = self.peek()
+        if kind == 'op' and value in ops:
+            self.pos += 1
+            return value
+        return None
+
+    def expect(self, op):
+        if self.take(op) is None:
+            raise FormulaError(f"Expected {op!r} at token {self.pos}, got {self.peek()[1]!r}")
+
+    def parse(self):
+        tree = self.ternary()
+        if self.pos != len(self.tokens):
+            raise FormulaError(f"Unexpected {self.peek()[1]!r} at token {self.pos}")
+        return tree
+
+    def ternary(self):
+        cond = self.binary(0)
+        if self.take('?'):
+            yes = self.ternary()
+            self.expect(':')
+            no = self.ternary()
+            return ('if', cond, yes, no)
+        return cond
+
+    _LEVELS = (('|',), ('&',), ('<', '>', '<=', '>=', '==', '!='), ('+', '-'), ('*', '/'))
+
+    def binary(self, level):
+        if level == len(self._LEVELS):
+            return self.unary()
+        left = self.binary(level + 1)
+        while True:
+            op = self.take(*self._LEVELS[level])
+            if op is None:
+                return left
+            left = ('op', op, left, self.binary(level + 1))
+
+    def unary(self):
+        op = self.take('-', '+')
+        if op is None:
+            return self.power()
+        operand = self.unary()
+        return ('neg', operand) if op == '-' else operand
+
+    def power(self):
+        base = self.atom()
+        if self.take('^'):
+            return ('op', '^', base, self.unary())
+        return base
+
+    def atom(self):
+        kind, value = self.peek()
+        if kind == 'num':
+            self.pos += 1
+            return ('num', value)
+        if kind == 'name':
+            self.pos += 1
+            if self.take('('):
+                args = [self.ternary()]
+                while self.take(','):
+                    args.append(self.ternary())
+                self.expect(')')
+                return ('call', value, args)
+            return ('name', value)
+        if self.take('('):
+            tree = self.ternary()
+            self.expect(')')
+            return tree
+        raise FormulaError(f"Unexpected {value!r} at token {self.pos}")
+
+
+def parse(text):
+    """公式文本 -> 语法树（嵌套 tuple）"""
+    return _Parser(text).parse()
+
+
+class Node:
+    __slots__ = ('id', 'op', 'args', 'value')
+
+    def __init__(self, id, op, args=(), value=None):
+        self.id = id
+        self.op = op
+        self.args = args
+        self.value = value
+
+    @property
+    def is_const(self):
+        return self.op == 'const'
+
+    def __repr__(self):
+        if self.op in ('const', 'field'):
+            return repr(self.value) if self.op == 'const' else self.value
+        return f"{self.op}({', '.join(map(repr, self.args))})"
+
+
+def _is_window(node):
+    return node.is_const and isinstance(node.value, (int, np.integer)) and node.value > 0
+
+
+class Compiler:
+    """
+    把公式编译进一个共享的 DAG：结构相同的子表达式（跨公式）只有一个节点
+    """
+
+    def __init__(self, macros=None):
+        self.macros = dict(MACROS, **(macros or {}))
+        self.nodes = {}       # key -> Node
+        self._macro_nodes = {}
+        self.tree_size = 0    # 展开成树时的运算节点数，用于衡量合并效果
+
+    def _intern(self, key, op, args=(), value=None):
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = Node(len(self.nodes), op, tuple(args), value)
+        return node
+
+    def const(self, value):
+        if isinstance(value, (bool, np.bool_)):
+            value = bool(value)
+        return self._intern(('const', type(value).__name__, value), 'const', value=value)
+
+    def op(self, op, *args):
+        """运算节点，带常量折叠和恒等化简"""
+        if all(arg.is_const for arg in args):
+            try:
+                if op == 'neg':
+                    return self.const(-args[0].value)
+                if op == 'if':
+                    return args[1] if args[0].value else args[2]
+                if op in _BINARY:
+                    return self.const(_BINARY[op](args[0].value, args[1].value))
+            except (ArithmeticError, TypeError, ValueError):
+                pass
+        if op == 'if' and args[0].is_const:
+            return args[1] if args[0].value else args[2]
+        if op == 'neg' and args[0].op == 'neg':
+            return args[0].args[0]
+        if op == '*':
+            for a, b in (args, args[::-1]):
+                if a.is_const and a.value == 1 and not isinstance(a.value, bool):
+                    return b
+                # -1 * X 与 -X 逐位相同，统一成 neg 以便合并
+                if a.is_const and a.value == -1:
+                    return self.op('neg', b)
+        if op in ('/', '^') and args[1].is_const and args[1].value == 1:
+            return args[0]
+        if op in _COMMUTATIVE and len(args) == 2:
+            args = tuple(sorted(args, key=lambda n: n.id))
+        return self._intern((op,) + tuple(arg.id for arg in args), op, args)
+
+    def call(self, name, args):
+        if name in ('MAX', 'MIN') and len(args) == 2 and _is_window(args[1]):
+            # MAX(X, n) 按 n 日滚动最大值理解（与手工实现一致）
+            name = 'TS' + name
+        if name == 'REGBETA' and len(args) == 3 and args[1].op == 'field' and args[1].value == 'SEQUENCE':
+            # REGBETA(A, SEQUENCE, n) 写法
+            args = [args[0], self.call('SEQUENCE', [args[2]])]
+        if name not in FUNCTIONS:
+            raise FormulaError(f"Unknown function {name}")
+        arity, params = FUNCTIONS[name]
+        if len(args) != arity:
+            raise FormulaError(f"{name} takes {arity} arguments, got {len(args)}")
+        for i in params:
+            if not args[i].is_const:
+                raise FormulaError(f"Argument {i + 1} of {name} must be a constant")
+        return self.op(name, *args)
+
+    def _build(self, tree):
+        kind = tree[0]
+        if kind not in ('num', 'name'):
+            self.tree_size += 1
+        if kind == 'num':
+            return self.const(tree[1])
+        if kind == 'name':
+            name = tree[1]
+            if name in FIELDS or name == 'SEQUENCE':
+                return self._intern(('field', name), 'field', value=name)
+            if name in self.macros:
+                if name not in self._macro_nodes:
+                    self._macro_nodes[name] = self.compile(self.macros[name])
+                return self._macro_nodes[name]
+            raise FormulaError(f"Unknown name {name}")
+        if kind == 'call':
+            return self.call(tree[1], [self._build(arg) for arg in tree[2]])
+        if kind == 'neg':
+            return self.op('neg', self._build(tree[1]))
+        if kind == 'if':
+            return self.op('if', *(self._build(arg) for arg in tree[1:]))
+        return self.op(tree[1], self._build(tree[2]), self._build(tree[3]))
+
+    def compile(self, text):
+        """公式文本 -> DAG 根节点"""
+        root = self._build(parse(text))
+        if root.op == 'field' and root.value == 'SEQUENCE':
+            raise FormulaError("SEQUENCE needs a length")
+        return root
+
+
+def _where(cond, yes, no):
+    like = next((v for v in (cond, yes, no) if isinstance(v, pd.DataFrame)), None)
+    if like is None:
+        like = next(v for v in (cond, yes, no) if isinstance(v, pd.Series))
+    values = np.where(np.asarray(cond, dtype=bool), np.asarray(yes) if not np.isscalar(yes) else yes,
+                      np.asarray(no) if not np.isscalar(no) else no)
+    if isinstance(like, pd.DataFrame):
+        return pd.DataFrame(values, index=like.index, columns=like.columns)
+    return pd.Series(values, index=like.index)
+
+
+class Plan:
+    """
+    一组公式的执行计划：DAG 节点的拓扑顺序，以及每个中间结果最后被使用的位置
+    """
+
+    def __init__(self, outputs):
+        self.outputs = dict(outputs)
+        self.steps = []
+        seen = set()
+        for root in self.outputs.values():
+            # 按公式顺序做后序遍历，使每个因子尽早算完
+            stack = [(root, False)]
+            while stack:
+                node, expanded = stack.pop()
+                if node.id in seen:
+                    continue
+                if expanded or not node.args:
+                    seen.add(node.id)
+                    self.steps.append(node)
+                    continue
+                stack.append((node, True))
+                stack.extend((arg, False) for arg in reversed(node.args) if arg.id not in seen)
+        self.uses = {}
+        for node in self.steps:
+            for arg in node.args:
+                self.uses[arg.id] = self.uses.get(arg.id, 0) + 1
+        self.names = {}
+        for name, root in self.outputs.items():
+            self.names.setdefault(root.id, []).append(name)
+
+    def summary(self):
+        ops = [node for node in self.steps if node.op not in ('const', 'field')]
+        return {'formulas': len(self.outputs), 'nodes': len(ops)}
+
+    def _evaluate(self, node, values, fields, functions):
+        if node.op == 'const':
+            return node.value
+        if node.op == 'field':
+            return fields[node.value]
+        args = [values[arg.id] for arg in node.args]
+        if node.op == 'neg':
+            # 按 X * -1 计算：浮点下与 -X 逐位相同，比较结果（布尔）则得到 -1/0 而不是取反
+            return args[0] * -1
+        if node.op == 'if':
+            return _where(*args)
+        if node.op in _BINARY:
+            return _BINARY[node.op](*args)
+        return functions[node.op](*args)
+
+    def run(self, fields, functions):
+        """
+        按计划计算，逐个产出 (公式名, 结果)
+        fields: 字段名 -> 面板；functions: 函数名 -> 算子
+        """
+        values = {}
+        uses = dict(self.uses)
+        for node in self.steps:
+            values[node.id] = self._evaluate(node, values, fields, functions)
+            for arg in node.args:
+                uses[arg.id] -= 1
+                if not uses[arg.id]:
+                    del values[arg.id]
+            for name in self.names.get(node.id, ()):
+                value = values[node.id]
+                if isinstance(value, (pd.DataFrame, pd.Series)) and value.to_numpy().dtype == bool:
+                    # 比较结果按 1/0 输出（同手工实现）
+                    value = value.astype(float)
+                yield name, value
+            if not uses.get(node.id):
+                values.pop(node.id, None)
+
+
+def compile_formulas(formulas, macros=None):
+    """
+    编译一组公式 {名称: 文本}
+    :return: (Plan, {名称: 无法编译的原因})
+    """
+    compiler = Compiler(macros)
+    outputs, errors = {}, {}
+    for name, text in formulas.items():
+        try:
+            outputs[name] = compiler.compile(text)
+        except FormulaError as e:
+            errors[name] = str(e)
+    plan = Plan(outputs)
+    plan.tree_size = compiler.tree_size
+    return plan, errors
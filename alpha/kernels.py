@@ -0,0 +1,262 @@
+"""
+滚动窗口计算内核
+对整个 (日期 × 股票) 面板一次性计算，替代逐格调用 Python 的 rolling().apply(lambda)
+
+与 pandas rolling(window).apply 的约定一致：
+前 window-1 行为空；窗口内含 NaN 或 inf 时结果为空
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 单个分块内的窗口元素数上限，控制中间数组的内存占用
+BLOCK_ELEMENTS = 1 << 22
+
+
+def _values(sr):
+    #转成二维 float 数组，inf 按 pandas 的处理视为缺失
+    values = np.asarray(sr, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    return np.where(np.isinf(values), np.nan, values)
+
+
+def _wrap(sr, out):
+    #还原成输入的 Series / DataFrame
+    if isinstance(sr, pd.Series):
+        return pd.Series(out[:, 0], index=sr.index, name=sr.name)
+    return pd.DataFrame(out, index=sr.index, columns=sr.columns)
+
+
+def _complete(values, window):
+    #每个窗口是否没有缺失值: (T-window+1, N)
+    missing = np.isnan(values).cumsum(axis=0)
+    missing = np.vstack([np.zeros((1, values.shape[1])), missing])
+    return missing[window:] - missing[:-window] == 0
+
+
+def rolling_apply(sr, window, kernel):
+    """
+    对每个长度为 window 的窗口执行 kernel
+    kernel 接收窗口数组 (rows, N, window)，窗口内按时间先后排列，返回 (rows, N)
+    """
+    values = _values(sr)
+    out = np.full(values.shape, np.nan)
+    if len(values) < window:
+        return _wrap(sr, out)
+
+    windows = sliding_window_view(values, window, axis=0)
+    complete = _complete(values, window)
+    step = max(1, BLOCK_ELEMENTS // max(1, values.shape[1] * window))
+    with np.errstate(all='ignore'):
+        for start in range(0, len(windows), step):
+            block = windows[start:start + step]
+            res = kernel(block)
+            out[window - 1 + start:window - 1 + start + len(block)] = \
+                np.where(complete[start:start + step], res, np.nan)
+    return _wrap(sr, out)
+
+
+def ts_rank(sr, window):
+    #窗口末尾值的顺位（并列取平均，同 scipy.stats.rankdata）
+    def kernel(w):
+        last = w[..., -1:]
+        return (w < last).sum(axis=-1) + ((w == last).sum(axis=-1) + 1) / 2
+    return rolling_apply(sr, window, kernel)
+
+
+def ts_prod(sr, window):
+    #窗口乘积
+    return rolling_apply(sr, window, lambda w: w.prod(axis=-1))
+
+
+def weighted_sum(sr, weights):
+    #窗口内按时间先后加权求和，weights[-1] 对应最新值
+    #逐元素相乘再求和（而非矩阵乘法），与 np.sum(weights*x) 的求和顺序一致，结果逐位相同
+    weights = np.asarray(weights, dtype=np.float64)
+    return rolling_apply(sr, len(weights), lambda w: (w * weights).sum(axis=-1))
+
+
+def decay_linear(sr, window):
+    #线性衰减加权均值，权重 1..window
+    weights = np.arange(1, window + 1, dtype=np.float64)
+    return weighted_sum(sr, weights) / weights.sum()
+
+
+def wma(sr, window, decay=0.9):
+    #指数衰减加权均值，权重 decay^(window-1) .. decay^0
+    weights = np.power(decay, np.arange(window - 1, -1, -1, dtype=np.float64))
+    return weighted_sum(sr, weights) / weights.sum()
+
+
+def reg_beta(sr, x):
+    #sr 在窗口内对固定序列 x 的一元线性回归斜率（同 np.polyfit(x, y, 1)[0]）
+    x = np.asarray(x, dtype=np.float64)
+    centered = x - x.mean()
+    return weighted_sum(sr, centered / (centered ** 2).sum())
+
+
+def low_day(sr, window):
+    #窗口内最小值距窗口末尾的天数（取最早出现的最小值）
+    return rolling_apply(sr, window, lambda w: window - w.argmin(axis=-1))
+
+
+def high_day(sr, window):
+    #窗口内最大值距窗口末尾的天数（取最早出现的最大值）
+    return rolling_apply(sr, window, lambda w: window - w.argmax(axis=-1))
+
+
+def ts_count(cond, window):
+    #窗口内条件成立的次数，按累计和相减计算（0/1 值上是精确的）
+    values = _values(cond)
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        total = np.vstack([np.zeros((1, values.shape[1])), np.nan_to_num(values).cumsum(axis=0)])
+        counts = total[window:] - total[:-window]
+        out[window - 1:] = np.where(_complete(values, window), counts, np.nan)
+    return _wrap(cond, out)
+
+
+def returns(sr):
+    #日收益率 x[t] / x[t-1] - 1，任一端缺失时为空
+    values = _values(sr)
+    out = np.full(values.shape, np.nan)
+    with np.errstate(all='ignore'):
+        out[1:] = values[1:] / values[:-1] - 1
+    return _wrap(sr, out)
+
+
+def _align(x, y):
+    #两个输入对齐到相同形状，任一方缺失的位置双方都视为缺失（同 pandas 的 rolling corr/cov）
+    if isinstance(x, pd.DataFrame) and isinstance(y, pd.Series):
+        y = pd.DataFrame({c: y for c in x.columns}, index=x.index)
+    elif isinstance(x, pd.Series) and isinstance(y, pd.DataFrame):
+        x = pd.DataFrame({c: x for c in y.columns}, index=y.index)
+    if isinstance(x, pd.DataFrame):
+        x, y = x.align(y)
+    elif not x.index.equals(y.index):
+        x, y = x.align(y)
+    xv, yv = _values(x), _values(y)
+    missing = np.isnan(xv) | np.isnan(yv)
+    xv[missing] = np.nan
+    yv[missing] = np.nan
+    return x, xv, yv
+
+
+class RollingMoments:
+    """
+    窗口内 x, y, x², y², xy 的和，由累计和相减得到，整个面板一次计算
+    Mean / Std / Cov / Corr 都由这些和导出
+
+    数值稳定性：按行分块重新累计，每块先减去块内均值，误差只取决于局部量级而不随序列长度增长；
+    窗口内值全部相同时方差、协方差精确为 0（按相邻值是否变化的累计计数判断）
+    """
+
+    def __init__(self, x, window, y=None):
+        self.window = window
+        if y is None:
+            self._like, xv, yv = x, _values(x), None
+        else:
+            self._like, xv, yv = _align(x, y)
+        self._shape = xv.shape
+        self._rows = len(xv) - window + 1
+        if self._rows <= 0:
+            return
+        # 每块 block 个窗口，块内累计的长度为 block + window - 1
+        self._block = max(16, 4 * window)
+        self._x = self._moments(xv)
+        self._y = self._moments(yv) if yv is not None else None
+        if yv is not None:
+            self._sxy = self._window_sum(self._x['centered'] * self._y['centered'])
+
+    def _segments(self, values):
+        #重叠的行块 (块数, N, block + window - 1)，末尾不足的部分补空值
+        blocks = -(-self._rows // self._block)
+        length = self._block + self.window - 1
+        pad = np.full((blocks * self._block + self.window - 1 - len(values), values.shape[1]), np.nan)
+        padded = np.vstack([values, pad])
+        return sliding_window_view(padded, length, axis=0)[::self._block]
+
+    def _window_sum(self, centered):
+        #每个窗口的和: (T-window+1, N)
+        blocks, n = centered.shape[0], centered.shape[1]
+        total = np.concatenate([np.zeros((blocks, n, 1)), centered.cumsum(axis=-1)], axis=-1)
+        sums = total[..., self.window:self.window + self._block] - total[..., :self._block]
+        return sums.transpose(0, 2, 1).reshape(blocks * self._block, n)[:self._rows]
+
+    def _moments(self, values):
+        segments = self._segments(values)
+        with np.errstate(all='ignore'):
+            ref = np.nan_to_num(np.nanmean(segments, axis=-1, keepdims=True))
+        # 缺失值按 0 累计，所在窗口由 complete 掩码排除
+        centered = np.nan_to_num(segments - ref)
+        # 窗口内 window-1 个相邻差分都没有变化即为常量窗口
+        changed = np.vstack([np.zeros((1, values.shape[1]), dtype=bool), values[1:] != values[:-1]])
+        changes = np.vstack([np.zeros((1, values.shape[1])), changed.cumsum(axis=0)])
+        return {
+            'values': values,
+            'complete': _complete(values, self.window),
+            'constant': changes[self.window:] - changes[1:self._rows + 1] == 0,
+            'ref': np.repeat(ref[..., 0], self._block, axis=0)[:self._rows],
+            'centered': centered,
+            's': self._window_sum(centered),
+            'ss': self._window_sum(centered * centered),
+        }
+
+    def _full(self, res=None):
+        #把窗口结果放回 (T, N) 面板，前 window-1 行和不完整窗口为空
+        out = np.full(self._shape, np.nan)
+        if res is not None:
+            out[self.window - 1:] = np.where(self._x['complete'], res, np.nan)
+        return out
+
+    def _var(self, m):
+        n = self.window
+        if n < 2:
+            return np.full(m['s'].shape, np.nan)
+        with np.errstate(all='ignore'):
+            var = (m['ss'] - m['s'] * m['s'] / n) / (n - 1)
+        return np.where(m['constant'], 0.0, np.maximum(var, 0.0))
+
+    def _cov(self):
+        x, y, n = self._x, self._y, self.window
+        if n < 2:
+            return np.full(x['s'].shape, np.nan)
+        with np.errstate(all='ignore'):
+            cov = (self._sxy - x['s'] * y['s'] / n) / (n - 1)
+        return np.where(x['constant'] | y['constant'], 0.0, cov)
+
+    def mean(self):
+        if self._rows <= 0:
+            return _wrap(self._like, self._full())
+        m = self._x
+        res = m['ref'] + m['s'] / self.window
+        # 常量窗口直接取值本身，避免舍入误差
+        res = np.where(m['constant'], m['values'][self.window - 1:], res)
+        return _wrap(self._like, self._full(res))
+
+    def std(self):
+        if self._rows <= 0:
+            return _wrap(self._like, self._full())
+        return _wrap(self._like, self._full(np.sqrt(self._var(self._x))))
+
+    def cov(self):
+        if self._rows <= 0:
+            return _wrap(self._like, self._full())
+        return _wrap(self._like, self._full(self._cov()))
+
+    def corr(self, fill=None):
+        """
+        滚动相关系数；任一方为常量的窗口无法计算，结果为空
+        fill 不为空时，从第 window 行起的空值都用 fill 填充
+        """
+        out = self._full()
+        if self._rows > 0:
+            with np.errstate(all='ignore'):
+                corr = self._cov() / np.sqrt(self._var(self._x) * self._var(self._y))
+            corr[~np.isfinite(corr)] = np.nan
+            out = self._full(corr)
+            if fill is not None:
+                body = out[self.window - 1:]
+                body[np.isnan(body)] = fill
+        return _wrap(self._like, out)
@@ -0,0 +1,163 @@
+"""
+算子级别的结果缓存
+同一批数据上多个因子共用的子表达式（如 Delay(self.close,1)、Rank(self.volume)）只计算一次
+
+键为 (算子, 输入对象标识, 参数)：面板输入按对象 id 区分，缓存命中时返回同一个对象，
+因此嵌套调用（如 Mean(Delay(self.close,1),6)）也能逐层命中。
+
+只有面板输入全部是已登记的原始数据（register）或其他缓存结果时才缓存：
+临时表达式（如 self.close - self.open）每次都是新对象，以它为输入的调用不可能再次命中。
+于是缓存持有的对象只有原始数据与缓存结果本身，某个结果被淘汰时，以它为输入的条目一并淘汰，
+缓存额外占用的内存（不含原始数据）即 nbytes，不超过 max_bytes。
+"""
+import functools
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# 小数组（如 Sequence(n)）按内容作为键，更大的按对象标识
+ARRAY_KEY_SIZE = 1024
+
+# 当前生效的缓存，由 OperatorCache.activate() 设置
+_active = None
+
+
+def _key(arg):
+    if isinstance(arg, (pd.DataFrame, pd.Series)):
+        return ('id', id(arg))
+    if isinstance(arg, np.ndarray):
+        if arg.size <= ARRAY_KEY_SIZE:
+            return ('array', arg.dtype.str, arg.shape, arg.tobytes())
+        return ('id', id(arg))
+    if arg is None or isinstance(arg, (bool, int, float, str, np.number)):
+        return (type(arg).__name__, arg)
+    raise TypeError(f"Unhashable operator argument: {type(arg).__name__}")
+
+
+def _nbytes(value):
+    # 因子面板为单一数值类型，to_numpy() 是视图，比逐列的 memory_usage() 快得多
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.to_numpy().nbytes
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return 0
+
+
+class OperatorCache:
+    """
+    算子结果的 LRU 缓存，缓存结果的总大小超过 max_bytes 时淘汰最久未使用的结果
+    """
+
+    def __init__(self, max_bytes=1 << 30):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (result, 按 id 区分的输入, nbytes)
+        self._sources = {}             # id -> 登记的原始数据面板
+        self._results = {}             # id(result) -> key
+        self._dependents = {}          # id(result) -> 以该结果为输入的条目
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def register(self, *sources):
+        """登记原始数据面板，以它们（及由它们算出的缓存结果）为输入的调用才会被缓存"""
+        for source in sources:
+            self._sources[id(source)] = source
+
+    def _inputs(self, args):
+        # 按 id 区分的输入（条目需持有它们以保证 id 不被复用）；任一输入不是原始数据或缓存结果时返回 None
+        inputs = []
+        for arg in args:
+            if isinstance(arg, (pd.DataFrame, pd.Series, np.ndarray)) and _key(arg)[0] == 'id':
+                if id(arg) not in self._sources and id(arg) not in self._results:
+                    return None
+                inputs.append(arg)
+        return tuple(inputs)
+
+    def call(self, func, args):
+        try:
+            key = (func.__qualname__, tuple(_key(arg) for arg in args))
+        except TypeError:
+            return func(*args)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        result = func(*args)
+        inputs = self._inputs(args)
+        nbytes = _nbytes(result)
+        if inputs is None or nbytes > self.max_bytes or id(result) in self._sources or id(result) in self._results:
+            return result
+        self._entries[key] = (result, inputs, nbytes)
+        self._results[id(result)] = key
+        for arg in inputs:
+            if id(arg) in self._results:
+                self._dependents.setdefault(id(arg), set()).add(key)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+        return result
+
+    def _evict(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        result, inputs, nbytes = entry
+        self.nbytes -= nbytes
+        del self._results[id(result)]
+        for arg in inputs:
+            dependents = self._dependents.get(id(arg))
+            if dependents is not None:
+                dependents.discard(key)
+        # 以该结果为输入的条目不能再命中，一并淘汰，避免它们继续持有该结果
+        for dependent in self._dependents.pop(id(result), ()):
+            self._evict(dependent)
+
+    def clear(self):
+        self._entries.clear()
+        self._results.clear()
+        self._dependents.clear()
+        self.nbytes = 0
+
+    def activate(self):
+        """在 with 块内让 memoized 算子使用本缓存"""
+        return _Activation(self)
+
+    def __getstate__(self):
+        # 传给子进程时不带缓存内容，子进程各自重新积累；登记的原始数据随计算对象一起传递
+        return {'max_bytes': self.max_bytes, 'sources': list(self._sources.values())}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_bytes'])
+        self.register(*state['sources'])
+
+
+class _Activation:
+    def __init__(self, cache):
+        self.cache = cache
+        self.previous = None
+
+    def __enter__(self):
+        global _active
+        self.previous, _active = _active, self.cache
+        return self.cache
+
+    def __exit__(self, *exc):
+        global _active
+        _active = self.previous
+
+
+def memoized(func):
+    """算子装饰器：有生效的缓存时从缓存取结果，否则直接计算"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _active is None or kwargs:
+            return func(*args, **kwargs)
+        return _active.call(func, args)
+    return wrapper
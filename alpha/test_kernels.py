@@ -0,0 +1,134 @@
+"""
+kernels 与原 rolling().apply(lambda) 实现的等价性测试
+面板含 NaN、±inf 与大量并列值
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import rankdata
+from kernels import (RollingMoments, ts_rank, ts_prod, decay_linear, wma, reg_beta, low_day, high_day,
+                     ts_count, returns)
+
+WINDOWS = [1, 2, 5, 20]
+
+
+def _panel(values, seed):
+    rng = np.random.default_rng(seed)
+    values = values.copy()
+    values[rng.random(values.shape) < 0.05] = np.nan
+    values[rng.random(values.shape) < 0.01] = np.inf
+    values[rng.random(values.shape) < 0.01] = -np.inf
+    return pd.DataFrame(values, index=pd.date_range('2020-01-01', periods=len(values)).strftime('%Y-%m-%d'),
+                        columns=[f's{i}' for i in range(values.shape[1])])
+
+
+@pytest.fixture
+def ties():
+    # 取值只有 5 种，窗口内大量并列
+    return _panel(np.random.default_rng(0).integers(1, 6, (120, 8)).astype(float), 1)
+
+
+@pytest.fixture
+def prices():
+    return _panel(np.exp(np.random.default_rng(2).standard_normal((120, 8)).cumsum(0) * 0.05) * 10, 3)
+
+
+def _check(result, expected):
+    assert type(result) is type(expected)
+    assert result.index.equals(expected.index)
+    np.testing.assert_allclose(np.asarray(result, float), np.asarray(expected, float), rtol=1e-9, atol=1e-12)
+
+
+# 原实现
+def _apply(sr, window, func):
+    return sr.rolling(window).apply(func, raw=False)
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_ts_rank(ties, window):
+    _check(ts_rank(ties, window), _apply(ties, window, lambda x: rankdata(x)[-1]))
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_ts_prod(prices, window):
+    _check(ts_prod(prices, window), _apply(prices, window, lambda x: np.prod(x)))
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_decay_linear(prices, window):
+    weights = np.array(range(1, window + 1))
+    _check(decay_linear(prices, window), _apply(prices, window, lambda x: np.sum(weights * x) / np.sum(weights)))
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_wma(prices, window):
+    weights = np.power(0.9, np.array(range(window - 1, -1, -1)))
+    _check(wma(prices, window), _apply(prices, window, lambda x: np.sum(weights * x) / np.sum(weights)))
+
+
+@pytest.mark.parametrize('window', [2, 6, 20])
+def test_reg_beta(prices, window):
+    x = np.arange(1, window + 1)
+    _check(reg_beta(prices, x), _apply(prices, window, lambda y: np.polyfit(x, y, deg=1)[0]))
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_low_high_day(ties, window):
+    _check(low_day(ties, window), _apply(ties, window, lambda x: len(x) - x.values.argmin()))
+    _check(high_day(ties, window), _apply(ties, window, lambda x: len(x) - x.values.argmax()))
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_ts_count(ties, window):
+    cond = (ties > 3).astype(float).where(ties.notna())
+    _check(ts_count(cond, window), _apply(cond, window, lambda x: x.sum()))
+
+
+def test_returns(prices):
+    _check(returns(prices), _apply(prices, 2, lambda x: x.iloc[-1] / x.iloc[0]) - 1)
+
+
+def test_series_input(prices):
+    sr = prices['s0']
+    _check(ts_rank(sr, 5), _apply(sr, 5, lambda x: rankdata(x)[-1]))
+    _check(decay_linear(sr, 5), _apply(sr, 5, lambda x: np.sum(np.arange(1, 6) * x) / 15))
+
+
+# RollingMoments 与 pandas 的 rolling mean/std/cov/corr 对比
+# 按 rolling().apply 的约定 inf 视为缺失，因此参照值先把 inf 换成 NaN
+def _finite(df):
+    return df.replace([np.inf, -np.inf], np.nan)
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+def test_moments(prices, window):
+    moments = RollingMoments(prices, window)
+    _check(moments.mean(), _finite(prices).rolling(window).mean())
+    if window > 1:
+        _check(moments.std(), _finite(prices).rolling(window).std())
+
+
+@pytest.mark.parametrize('window', [2, 5, 20])
+def test_cov_corr(prices, window):
+    other = _panel(np.random.default_rng(4).standard_normal(prices.shape), 5)
+    x, y = _finite(prices), _finite(other)
+    moments = RollingMoments(prices, window, other)
+    _check(moments.cov(), x.rolling(window).cov(y))
+    _check(moments.corr(), x.rolling(window).corr(y))
+    # 原 Corr：空值填 0，前 window-1 行为空
+    expected = x.rolling(window).corr(y).fillna(0)
+    expected.iloc[:window - 1, :] = np.nan
+    _check(moments.corr(fill=0), expected)
+
+
+def test_constant_windows():
+    # 常量窗口：标准差与协方差精确为 0，相关系数无法计算
+    values = pd.DataFrame({'a': [1.0, 1.0, 1.0, 2.0, 2.0, 2.0], 'b': [0.1] * 6})
+    other = pd.DataFrame({'a': [3.0, 1.0, 2.0, 5.0, 4.0, 6.0], 'b': [1.0, 2.0, 4.0, 3.0, 5.0, 6.0]})
+    std = RollingMoments(values, 3).std()
+    assert std['a'].iloc[[2, 5]].eq(0).all() and std['b'].iloc[2:].eq(0).all()
+    assert RollingMoments(values, 3).mean()['b'].iloc[2:].eq(0.1).all()
+    moments = RollingMoments(values, 3, other)
+    assert moments.cov()['b'].iloc[2:].eq(0).all()
+    assert moments.corr()['b'].isna().all()
+    assert moments.corr(fill=0)['b'].iloc[2:].eq(0).all()
@@ -0,0 +1,112 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from core.provider_pool import _init_worker, _call_provider
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter.
+    Allows bursts up to `capacity` requests and `rate` requests per second on average.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncBaostockProvider:
+    """
+    Awaitable facade over BaostockProvider.
+
+    The baostock client is blocking and keeps one global socket per process, so
+    calls run in a process pool where every worker holds its own login. A
+    semaphore caps in-flight requests and a token bucket keeps the request rate
+    within what the baostock server tolerates.
+    """
+
+    def __init__(self, workers=None, max_concurrency=16, rate=20, use_bar_store=True):
+        self.workers = workers or min(os.cpu_count() or 1, 8)
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = TokenBucket(rate)
+        self.use_bar_store = use_bar_store
+        self._executor = None
+        self._semaphore = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                 initargs=(self.use_bar_store,))
+        return self._executor
+
+    async def _call(self, method, *args, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            await self.rate_limiter.acquire()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), _call_provider, method, args, kwargs)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def get_latest_trading_date(self):
+        return await self._call('get_latest_trading_date')
+
+    async def get_hs300_stocks(self, date):
+        return await self._call('get_hs300_stocks', date)
+
+    async def get_daily_bars(self, code, end_date, lookback_days=60, lookback_bars=None, fields=None):
+        return await self._call('get_daily_bars', code, end_date, lookback_days=lookback_days,
+                                lookback_bars=lookback_bars, fields=fields)
+
+    async def get_daily_bars_many(self, codes, end_date, lookback_days=60, lookback_bars=None, fields=None):
+        """Fetch many codes concurrently; returns a list aligned with codes (None on failure)."""
+        tasks = [self.get_daily_bars(code, end_date, lookback_days=lookback_days,
+                                     lookback_bars=lookback_bars, fields=fields)
+                 for code in codes]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        bars = []
+        for code, res in zip(codes, results):
+            if isinstance(res, Exception):
+                print(f"Error fetching daily bars for {code}: {res}")
+                res = None
+            bars.append(res)
+        return bars
+
+    async def get_profit_data(self, code, year, quarter):
+        return await self._call('get_profit_data', code, year, quarter)
+
+    async def get_operation_data(self, code, year, quarter):
+        return await self._call('get_operation_data', code, year, quarter)
+
+    async def get_growth_data(self, code, year, quarter):
+        return await self._call('get_growth_data', code, year, quarter)
+
+    async def get_balance_data(self, code, year, quarter):
+        return await self._call('get_balance_data', code, year, quarter)
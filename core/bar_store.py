@@ -0,0 +1,116 @@
+import os
+import json
+import datetime
+import pandas as pd
+from utils.file_io import get_cache_dir
+
+# Fields requested for daily bars (peTTM, pbMRQ, turn, isST support the value/turnover strategies)
+DAILY_FIELDS = "date,code,open,high,low,close,volume,amount,pctChg,peTTM,pbMRQ,turn,isST"
+NUMERIC_COLS = ['open', 'high', 'low', 'close', 'volume', 'amount', 'pctChg', 'peTTM', 'pbMRQ', 'turn']
+
+
+def _shift_date(date_str, days):
+    dt = datetime.datetime.strptime(date_str, "%Y-%m-%d") + datetime.timedelta(days=days)
+    return dt.strftime("%Y-%m-%d")
+
+
+def normalize_bars(df):
+    """Cast a raw bar DataFrame to the stored column types."""
+    df = df.copy()
+    for col in df.columns:
+        if col in NUMERIC_COLS:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        else:
+            df[col] = df[col].astype(str)
+    return df
+
+
+class BarStore:
+    """
+    Local columnar store for daily bars, one Parquet file per code.
+    A small JSON sidecar records the date range already synced from baostock,
+    so a request only has to fetch the part of the window not yet on disk.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or get_cache_dir('bars')
+
+    def _paths(self, code):
+        base = os.path.join(self.root, code)
+        return base + '.parquet', base + '.json'
+
+    def load(self, code):
+        """Return (bars, meta) for a code, or (None, None) if nothing is stored."""
+        data_path, meta_path = self._paths(code)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            df = pd.read_parquet(data_path)
+        except Exception as e:
+            print(f"Error reading bar store for {code}: {e}")
+            return None, None
+        return df, meta
+
+    def save(self, code, df, meta):
+        data_path, meta_path = self._paths(code)
+        # Write to temp files first so a crash never leaves a half-written partition
+        df.to_parquet(data_path + '.tmp', index=False)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(data_path + '.tmp', data_path)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def get(self, code, start_date, end_date, fetch):
+        """
+        Serve bars for [start_date, end_date], syncing missing ranges first.
+
+        :param fetch: callable(code, start_date, end_date) -> DataFrame (may be empty),
+                      or None if the query failed (the range is then not marked as synced)
+        """
+        stored, meta = self.load(code)
+        frames = [] if stored is None else [stored]
+        synced_start = meta['start'] if meta else None
+        synced_end = meta['end'] if meta else None
+        changed = False
+
+        if synced_start is None:
+            fetched = fetch(code, start_date, end_date)
+            if fetched is not None:
+                frames.append(normalize_bars(fetched))
+                synced_start, synced_end = start_date, end_date
+                changed = True
+        else:
+            if start_date < synced_start:
+                fetched = fetch(code, start_date, _shift_date(synced_start, -1))
+                if fetched is not None:
+                    frames.append(normalize_bars(fetched))
+                    synced_start = start_date
+                    changed = True
+            if end_date > synced_end:
+                fetched = fetch(code, _shift_date(synced_end, 1), end_date)
+                if fetched is not None:
+                    frames.append(normalize_bars(fetched))
+                    synced_end = end_date
+                    changed = True
+
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            df = None
+        else:
+            df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+        if changed:
+            if df is not None:
+                df = df.drop_duplicates(subset='date', keep='last').sort_values('date').reset_index(drop=True)
+            # Today's bar may not be published yet, so never mark today as synced
+            yesterday = _shift_date(datetime.datetime.now().strftime("%Y-%m-%d"), -1)
+            meta = {'start': synced_start, 'end': min(synced_end, yesterday)}
+            if meta['end'] >= meta['start']:
+                self.save(code, df if df is not None else pd.DataFrame(columns=DAILY_FIELDS.split(',')), meta)
+
+        if df is None:
+            return None
+        window = df[(df['date'] >= start_date) & (df['date'] <= end_date)].reset_index(drop=True)
+        return window if not window.empty else None
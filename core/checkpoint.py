@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import hashlib
+from utils.file_io import get_cache_dir, json_default
+
+
+class ScanCheckpoint:
+    """
+    Progress of one scan, saved to disk so an interrupted scan can resume.
+
+    A checkpoint belongs to a (stock pool, strategy set, date, logic) combination:
+    it records the codes already scanned and the results found for them, and is
+    only reused by a scan with the same combination.
+    """
+
+    def __init__(self, stock_pool, strategies, date, logic='or', interval=30, path=None):
+        self.pool_hash = hashlib.sha1(",".join(stock_pool).encode('utf-8')).hexdigest()
+        self.strategies = [s.name for s in strategies]
+        self.date = date
+        self.logic = logic
+        # Minimum seconds between two saves from maybe_save()
+        self.interval = interval
+        key = hashlib.sha1(json.dumps([self.pool_hash, self.strategies, date, logic]).encode('utf-8')).hexdigest()
+        self.path = path or os.path.join(get_cache_dir('checkpoints'), f"{date}_{key[:16]}.json")
+        self.processed = set()
+        self.results = []
+        self._saved_at = time.time()
+
+    def load(self):
+        """Restore progress from disk. Returns False if there is no matching checkpoint."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except Exception as e:
+            print(f"Error reading checkpoint {self.path}: {e}")
+            return False
+
+        if [entry.get('pool_hash'), entry.get('strategies'), entry.get('date'), entry.get('logic')] != \
+                [self.pool_hash, self.strategies, self.date, self.logic]:
+            return False
+        self.processed = set(entry['processed'])
+        self.results = entry['results']
+        return True
+
+    def update(self, codes, results):
+        """Record a batch of scanned codes and the results found for them."""
+        self.processed.update(codes)
+        self.results.extend(results)
+
+    def save(self):
+        entry = {
+            'pool_hash': self.pool_hash,
+            'strategies': self.strategies,
+            'date': self.date,
+            'logic': self.logic,
+            'processed': sorted(self.processed),
+            'results': self.results,
+        }
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, default=json_default)
+        os.replace(self.path + '.tmp', self.path)
+        self._saved_at = time.time()
+
+    def maybe_save(self):
+        """Save if the interval has elapsed since the last save."""
+        if time.time() - self._saved_at >= self.interval:
+            self.save()
+
+    def clear(self):
+        """Drop the checkpoint once the scan has completed."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.processed = set()
+        self.results = []
@@ -1,89 +1,232 @@
 import baostock as bs
-import pandas as pd
+import os
 import datetime
+import threading
+from core.bar_store import BarStore, DAILY_FIELDS
+from core.result_parser import fetch_rows, to_frame
+from core.provider_pool import ProviderPool
+from core.fundamental_cache import FundamentalCache
+from core.trading_calendar import TradingCalendar
+from core.profiler import profiler
 
 class BaostockProvider:
-    def __init__(self):
+    def __init__(self, use_bar_store=True, workers=4, use_fundamental_cache=True):
         self.is_logged_in = False
+        # baostock module, or a recording/replaying stand-in (see core.replay)
+        self.client = bs
+        # Local Parquet store for daily bars; None means always query baostock
+        self.bar_store = BarStore() if use_bar_store else None
+        # On-disk cache for quarterly reports; None means always query baostock
+        self.fundamental_cache = FundamentalCache() if use_fundamental_cache else None
+        # Trading calendar, loaded lazily and persisted locally
+        self.calendar = TradingCalendar(self._query_trade_dates)
+        # Default number of parallel baostock sessions for bulk fetching
+        self.workers = workers
+        self._pool = None
+        # One baostock session per process: queries from several threads are serialized
+        self._lock = threading.RLock()
 
     def login(self):
         if not self.is_logged_in:
-            bs.login()
+            with profiler.timer('provider.login'):
+                self.client.login()
             self.is_logged_in = True
 
     def logout(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
         if self.is_logged_in:
-            bs.logout()
+            self.client.logout()
             self.is_logged_in = False
 
+    def use_fixtures(self, record_dir=None, replay_dir=None):
+        """
+        Route every baostock query through a recording or replaying client.
+        Local stores are bypassed so each query hits the fixtures, and bulk
+        fetching stays in-process so the workers see the same client.
+        """
+        from core.replay import RecordingClient, ReplayClient
+        self.logout()
+        fixture_dir = replay_dir or record_dir
+        if replay_dir:
+            self.client = ReplayClient(replay_dir)
+        else:
+            self.client = RecordingClient(bs, record_dir)
+        self.bar_store = None
+        self.fundamental_cache = None
+        self.workers = 1
+        # Keep the calendar with the fixtures; a replayed calendar is never refreshed
+        self.calendar = TradingCalendar(self._query_trade_dates,
+                                        path=os.path.join(fixture_dir, 'trade_dates.parquet'),
+                                        auto_refresh=not replay_dir)
+        return self
+
+    def _query(self, query_func, *args, **kwargs):
+        """Run a baostock query and drain all its pages: (rs, rows)."""
+        with self._lock:
+            self.login()
+            # Network time: the query plus paging through its result
+            with profiler.timer(f"provider.{getattr(query_func, '__name__', 'query')}"):
+                rs = query_func(*args, **kwargs)
+                return rs, fetch_rows(rs)
+
+    def _query_trade_dates(self, start_date, end_date):
+        rs, data_list = self._query(self.client.query_trade_dates, start_date=start_date, end_date=end_date)
+        if not data_list:
+            return None
+        return to_frame(rs.fields, data_list)
+
     def get_latest_trading_date(self):
-        self.login()
         today = datetime.datetime.now().strftime("%Y-%m-%d")
-        start_lookback = (datetime.datetime.now() - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
-        rs = bs.query_trade_dates(start_date=start_lookback, end_date=today)
-        
-        data_list = []
-        while (rs.error_code == '0') & rs.next():
-            data_list.append(rs.get_row_data())
-            
-        if not data_list: return today
-        
-        df = pd.DataFrame(data_list, columns=rs.fields)
-        trading_days = df[df['is_trading_day'] == '1']['calendar_date'].tolist()
-        return trading_days[-1] if trading_days else today
+        try:
+            return self.calendar.latest(today)
+        except Exception as e:
+            print(f"Error loading trading calendar: {e}")
+            return today
 
     def get_hs300_stocks(self, date):
-        self.login()
         print(f"正在获取 {date} 的沪深300成分股...")
-        rs = bs.query_hs300_stocks(date=date)
-        hs300_stocks = []
-        while (rs.error_code == '0') & rs.next():
-            hs300_stocks.append(rs.get_row_data()[1]) # code is at index 1
-        return hs300_stocks
-
-    def get_daily_bars(self, code, end_date, lookback_days=60):
-        self.login()
-        start_date = (datetime.datetime.strptime(end_date, "%Y-%m-%d") - datetime.timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+        rs, data_list = self._query(self.client.query_hs300_stocks, date=date)
+        return [row[1] for row in data_list] # code is at index 1
+
+    def get_daily_bars(self, code, end_date, lookback_days=60, lookback_bars=None, fields=None):
+        """
+        Daily bars up to end_date.
+        :param lookback_days: calendar-day window (used when lookback_bars is not given)
+        :param lookback_bars: exact number of trading-day bars to return
+        :param fields: subset of DAILY_FIELDS to return (defaults to all)
+        """
+        start_date = self._lookback_start(end_date, lookback_days, lookback_bars)
+        profiler.count('provider.daily_bars.requests')
+
+        if self.bar_store is not None:
+            # Serve from the local store, only fetching the missing head/tail.
+            # The store always keeps every field so it serves any strategy set.
+            df = self.bar_store.get(code, start_date, end_date, self._fetch_daily_bars)
+        else:
+            df = self._fetch_daily_bars(code, start_date, end_date, fields=fields)
         
+        if df is None or df.empty:
+            return None
+        if lookback_bars:
+            df = df.tail(lookback_bars).reset_index(drop=True)
+        if fields:
+            df = df[[f for f in fields if f in df.columns]]
+        return df
+
+    def _lookback_start(self, end_date, lookback_days, lookback_bars):
+        if lookback_bars:
+            try:
+                return self.calendar.offset(end_date, -(lookback_bars - 1))
+            except Exception as e:
+                print(f"Error using trading calendar, falling back to calendar days: {e}")
+                # Roughly 5 trading days per 7 calendar days, plus room for holidays
+                lookback_days = lookback_bars * 7 // 5 + 15
+        return (datetime.datetime.strptime(end_date, "%Y-%m-%d") - datetime.timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+
+    def get_daily_bars_many(self, codes, end_date, lookback_days=60, lookback_bars=None, fields=None, workers=None):
+        """
+        Fetch daily bars for many codes using a pool of baostock sessions.
+        Returns a list aligned with codes (None for codes without data or that failed).
+        """
+        kwargs = {'lookback_days': lookback_days, 'lookback_bars': lookback_bars, 'fields': fields}
+        pool = self._get_pool(workers, len(codes))
+        if pool is None:
+            results = []
+            for code in codes:
+                try:
+                    results.append(self.get_daily_bars(code, end_date, **kwargs))
+                except Exception as e:
+                    print(f"Error fetching daily bars for {code}: {e}")
+                    results.append(None)
+            return results
+        return pool.get_daily_bars_many(codes, end_date, **kwargs)
+
+    def call_many(self, method, args_list, workers=None):
+        """
+        Call a provider method (e.g. 'get_growth_data') for each args tuple using the session pool.
+        Returns a list aligned with args_list (None for calls that failed).
+        """
+        pool = self._get_pool(workers, len(args_list))
+        if pool is None:
+            results = []
+            for args in args_list:
+                try:
+                    results.append(getattr(self, method)(*args))
+                except Exception as e:
+                    print(f"Error calling {method}{tuple(args)}: {e}")
+                    results.append(None)
+            return results
+        return pool.call_many(method, args_list)
+
+    def _get_pool(self, workers, n_tasks):
+        """Worker pool for bulk calls, or None when the work should stay in-process."""
+        workers = workers or self.workers
+        if workers <= 1 or n_tasks <= 1:
+            return None
+        # Reuse the worker pool across calls; sessions are closed on logout()
+        with self._lock:
+            # A profiling pool also serves callers that are not profiling (their merge() is a no-op),
+            # so sessions with and without profiling do not keep restarting it
+            if self._pool is None or self._pool.workers != workers or (profiler.enabled and not self._pool.profile):
+                if self._pool is not None:
+                    self._pool.close()
+                self._pool = ProviderPool(workers, use_bar_store=self.bar_store is not None,
+                                          profile=profiler.enabled)
+            return self._pool
+
+    def _fetch_daily_bars(self, code, start_date, end_date, fields=None):
+        """
+        Query daily bars from baostock.
+        Returns a (possibly empty) DataFrame, or None if the query failed.
+        """
         # Increased fields to support more strategies (peTTM, pbMRQ, turn, isST)
-        rs = bs.query_history_k_data_plus(code,
-            "date,code,open,high,low,close,volume,amount,pctChg,peTTM,pbMRQ,turn,isST",
+        query_fields = ",".join(f for f in DAILY_FIELDS.split(',') if f in fields) if fields else DAILY_FIELDS
+        rs, data_list = self._query(self.client.query_history_k_data_plus, code,
+            query_fields,
             start_date=start_date, end_date=end_date,
             frequency="d", adjustflag="3")
-        
-        data_list = []
-        while (rs.error_code == '0') & rs.next():
-            data_list.append(rs.get_row_data())
-            
-        if not data_list:
+
+        if rs.error_code != '0':
+            print(f"Error querying daily bars for {code}: {rs.error_msg}")
             return None
 
-        df = pd.DataFrame(data_list, columns=rs.fields)
-        
-        # Data Type Conversion
-        numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'amount', 'pctChg', 'peTTM', 'pbMRQ', 'turn']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                
-        return df
+        # Decode straight into typed columns (numeric fields as float64)
+        profiler.count('provider.daily_bars.queries')
+        with profiler.timer('provider.parse'):
+            return to_frame(rs.fields or query_fields.split(','), data_list, 'query_history_k_data_plus')
 
     def _query_quarterly_data(self, query_func, code, year, quarter):
         """
         Helper method to query quarterly financial data.
+        Answers are served from the fundamental cache when available.
+        Returns an empty DataFrame when no report is published yet and None when
+        the query failed, so callers can retry only real failures.
         """
-        self.login()
+        query_type = query_func.__name__
+        if self.fundamental_cache is not None:
+            hit, df = self.fundamental_cache.get(query_type, code, year, quarter)
+            profiler.count('fundamental_cache.hit' if hit else 'fundamental_cache.miss')
+            if hit:
+                return df
+
         try:
-            rs = query_func(code=code, year=year, quarter=quarter)
-            data_list = []
-            while (rs.error_code == '0') & rs.next():
-                data_list.append(rs.get_row_data())
+            rs, data_list = self._query(query_func, code=code, year=year, quarter=quarter)
+
+            # Only cache successful answers; query errors are retried next time
+            if rs.error_code != '0':
+                print(f"Error querying quarterly data for {code} {year}Q{quarter}: {rs.error_msg}")
+                return None
+
+            if self.fundamental_cache is not None:
+                self.fundamental_cache.put(query_type, code, year, quarter, rs.fields, data_list)
             
             if not data_list:
-                return None
+                return to_frame(rs.fields, [], query_type)
             
-            df = pd.DataFrame(data_list, columns=rs.fields)
-            return df
+            with profiler.timer('provider.parse'):
+                return to_frame(rs.fields, data_list, query_type)
         except Exception as e:
             print(f"Error querying quarterly data for {code} {year}Q{quarter}: {e}")
             return None
@@ -92,26 +235,33 @@ class BaostockProvider:
         """
         季频盈利能力: roeAvg, npMargin, gpMargin, netProfit, etc.
         """
-        return self._query_quarterly_data(bs.query_profit_data, code, year, quarter)
+        return self._query_quarterly_data(self.client.query_profit_data, code, year, quarter)
 
     def get_operation_data(self, code, year, quarter):
         """
         季频营运能力: NRTurnRatio, invTurnRatio, etc.
         """
-        return self._query_quarterly_data(bs.query_operation_data, code, year, quarter)
+        return self._query_quarterly_data(self.client.query_operation_data, code, year, quarter)
 
     def get_growth_data(self, code, year, quarter):
         """
         季频成长能力: YOYEquity, YOYAsset, YOYNI, etc.
         """
-        return self._query_quarterly_data(bs.query_growth_data, code, year, quarter)
+        return self._query_quarterly_data(self.client.query_growth_data, code, year, quarter)
 
     def get_balance_data(self, code, year, quarter):
         """
         季频偿债能力: currentRatio, quickRatio, cashRatio, liabilityToAsset, etc.
         """
-        return self._query_quarterly_data(bs.query_balance_data, code, year, quarter)
+        return self._query_quarterly_data(self.client.query_balance_data, code, year, quarter)
 
 
 # Singleton instance for easy access
 data_provider = BaostockProvider()
+
+# Offline/deterministic runs: OMNIALPHA_REPLAY=<dir> serves recorded responses,
+# OMNIALPHA_RECORD=<dir> records every live response to <dir>
+if os.environ.get('OMNIALPHA_REPLAY'):
+    data_provider.use_fixtures(replay_dir=os.environ['OMNIALPHA_REPLAY'])
+elif os.environ.get('OMNIALPHA_RECORD'):
+    data_provider.use_fixtures(record_dir=os.environ['OMNIALPHA_RECORD'])
@@ -1,61 +1,619 @@
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
 from core.data_provider import data_provider
+from core.profiler import profiler, current as current_profiler
+from core.bar_store import DAILY_FIELDS
+from core.indicators import IndicatorCache
+from core.rolling_state import RollingStateStore
+
+# Trading days fetched per stock: twice the largest warm-up, and never less than the
+# ~40 bars of the 60 calendar days fetched before strategies declared min_bars, so a
+# stock suspended for a few sessions still has min_bars rows
+LOOKBACK_MARGIN = 2
+MIN_LOOKBACK_BARS = 40
+
+
+def build_panel(codes, bars, fields):
+    """
+    Scatter per-stock bars into a wide panel: dict of field -> DataFrame (index: date, columns: code).
+    Each field is filled with a single fancy-indexed assignment instead of a pivot.
+    """
+    present = [(code, df) for code, df in zip(codes, bars) if df is not None and not df.empty]
+    if not present:
+        return None
+    
+    # Stack once, then scatter each field into a (date x code) grid
+    long = pd.concat([df for _, df in present], ignore_index=True)
+    all_dates = long['date'].to_numpy(dtype=object)
+    dates = np.unique(all_dates)
+    rows = np.searchsorted(dates, all_dates)
+    cols = np.repeat(np.arange(len(present)), [len(df) for _, df in present])
+    columns = [code for code, _ in present]
+    
+    panel = {}
+    for field in fields:
+        if field in ('date', 'code') or field not in long.columns:
+            continue
+        values = long[field].to_numpy()
+        if values.dtype.kind == 'f':
+            grid = np.full((len(dates), len(present)), np.nan)
+        else:
+            grid = np.full((len(dates), len(present)), None, dtype=object)
+        grid[rows, cols] = values
+        panel[field] = pd.DataFrame(grid, index=dates, columns=columns)
+    return panel
+
+# Per-process engine for parallel runs, set by the pool initializer
+_worker_engine = None
+
+def _init_engine_worker(engine, stock_pool, dates, profile=False):
+    global _worker_engine
+    profiler.enable(profile)
+    # Each worker opens its own baostock session and fetches in-process;
+    # the parent's session pool is not inherited
+    data_provider._pool = None
+    data_provider.is_logged_in = False
+    data_provider.workers = 1
+    data_provider.login()
+    # Cheap when the parent already loaded the pool-wide data (memory after fork, disk otherwise)
+    for date in dates:
+        engine.prepare(stock_pool, date)
+    _worker_engine = engine
+
+def _scan_chunk_task(args):
+    codes, dates = args
+    results, stats = _worker_engine._scan_dates(codes, dates, workers=1)
+    # New result cache entries go back to the parent, which owns the cache files
+    entries = _worker_engine.result_cache.drain() if _worker_engine.result_cache is not None else []
+    return results, stats, entries, profiler.drain()
+
+def _fingerprint(strategy, code, df):
+    """
+    Fingerprint of a strategy's input for one stock: the last min_bars bars of its
+    required fields plus anything it declares itself. None if it cannot be cached.
+    """
+    extra = strategy.data_fingerprint(code, df)
+    if extra is None:
+        return None
+    bars = df[[f for f in strategy.required_fields if f in df.columns]].tail(strategy.min_bars)
+    digest = hashlib.sha1(pd.util.hash_pandas_object(bars, index=False).to_numpy().tobytes())
+    digest.update(extra.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+class StrategyStats:
+    """
+    Running cost and pass rate of one strategy's check().
+    Until a few calls have been measured the strategy's declared cost hint is used.
+    """
+    MIN_SAMPLES = 5
+
+    def __init__(self, cost_hint):
+        self.cost_hint = cost_hint
+        self.calls = 0
+        self.passes = 0
+        self.seconds = 0.0
+        self.cached = 0  # outcomes served from the result cache (not counted in calls)
+
+    def record(self, passed, seconds):
+        self.calls += 1
+        self.passes += bool(passed)
+        self.seconds += seconds
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.passes += other.passes
+        self.seconds += other.seconds
+        self.cached += other.cached
+
+    @property
+    def cost(self):
+        if self.calls < self.MIN_SAMPLES:
+            return self.cost_hint
+        return self.seconds / self.calls
+
+    @property
+    def pass_rate(self):
+        # Laplace-smoothed so an unseen strategy starts at 50%
+        return (self.passes + 1) / (self.calls + 2)
+
+    def rank(self):
+        """Expected cost per rejected stock: lower runs first in an AND scan."""
+        return self.cost / max(1 - self.pass_rate, 1e-6)
 
 class AnalysisEngine:
-    def __init__(self, strategies):
+    def __init__(self, strategies, stats=None, indicators=None, result_cache=None):
         self.strategies = strategies
+        # Fetch only the fields and warm-up the active strategies declare
+        self.fields, self.lookback_bars = self._data_requirements(strategies)
+        # Strategy name -> StrategyStats. Pass a dict to keep stats across engines (e.g. web reruns)
+        self.stats = stats if stats is not None else {}
+        for strategy in strategies:
+            self.stats.setdefault(strategy.name, StrategyStats(strategy.cost))
+        # Indicators shared by all strategies, computed once per stock; a small LRU is
+        # enough for a scan since every strategy checks a stock before the next one
+        self.indicators = indicators if indicators is not None else IndicatorCache()
+        # Optional core.result_cache.ResultCache reusing check() outcomes across runs
+        self.result_cache = result_cache
+        self._cache_keys = {strategy: strategy.cache_key() for strategy in strategies}
+
+    @staticmethod
+    def _data_requirements(strategies):
+        needed = {'date', 'code'}
+        warmup = 1
+        for strategy in strategies:
+            needed.update(strategy.required_fields)
+            warmup = max(warmup, strategy.min_bars)
+        fields = [f for f in DAILY_FIELDS.split(',') if f in needed]
+        return fields, max(warmup * LOOKBACK_MARGIN, MIN_LOOKBACK_BARS)
+
+    def prepare(self, stock_pool, date):
+        """Let strategies preload pool-wide data (e.g. quarterly report snapshots) once."""
+        with profiler.timer('engine.prepare'):
+            for strategy in self.strategies:
+                strategy.prepare(stock_pool, date)
+
+    def _check(self, strategy, code, df, date, indicators=None, stats=None):
+        """
+        strategy.check() with its cost and outcome recorded (into self.stats by default).
+        Outcomes are served from / stored in the result cache when one is set.
+        """
+        stats = (stats or self.stats)[strategy.name]
+        fingerprint = None
+        if self.result_cache is not None:
+            fingerprint = _fingerprint(strategy, code, df)
+            if fingerprint is not None:
+                hit, is_match, details = self.result_cache.get(self._cache_keys[strategy], date, code, fingerprint)
+                if hit:
+                    stats.cached += 1
+                    profiler.count('result_cache.hit')
+                    return is_match, details
+                profiler.count('result_cache.miss')
+        
+        start = time.perf_counter()
+        is_match, details = strategy.check(code, df, indicators)
+        elapsed = time.perf_counter() - start
+        stats.record(is_match, elapsed)
+        profiler.add_time(f"check.{strategy.name}", elapsed)
+        
+        if fingerprint is not None:
+            self.result_cache.put(self._cache_keys[strategy], date, code, fingerprint, is_match, details)
+        return is_match, details
+
+    def ordered_strategies(self):
+        """Strategies cheapest and most selective first, by their measured (or declared) stats."""
+        return sorted(self.strategies, key=lambda s: self.stats[s.name].rank())
 
     def scan_one(self, code, date):
         """Scan a single stock with all strategies (Intersection / AND logic)."""
         # Fetch data once per stock
-        df = data_provider.get_daily_bars(code, date)
+        df = data_provider.get_daily_bars(code, date, lookback_bars=self.lookback_bars, fields=self.fields)
         
         if df is None or df.empty:
             return None
         
+        # Cheap, selective strategies first so expensive ones (report queries) run on fewer stocks
+        indicators = self.indicators.get(code, df)
+        passed = {}
+        for strategy in self.ordered_strategies():
+            is_match, details = self._check(strategy, code, df, date, indicators)
+            
+            if not is_match:
+                # If ANY strategy fails, the stock is rejected (AND logic)
+                return None
+            passed[strategy] = details
+            
+        # If loop finishes, all strategies matched; report them in the user's order
         combined_details = {
             'code': code,
             'date': date,
-            'strategy': [] # List of strategy names passed
+            'strategy': ", ".join(s.name for s in self.strategies)
         }
+        for strategy in self.strategies:
+            combined_details.update(passed[strategy])
+        return combined_details
+
+    def summary(self):
+        """Per-strategy stats in evaluation order, as a list of dicts."""
+        rows = []
+        for strategy in self.ordered_strategies():
+            stats = self.stats[strategy.name]
+            rows.append({
+                'strategy': strategy.name,
+                'checks': stats.calls,
+                'cached': stats.cached,
+                'passed': stats.passes,
+                'pass_rate': round(stats.passes / stats.calls, 3) if stats.calls else None,
+                'avg_ms': round(stats.seconds / stats.calls * 1000, 3) if stats.calls else None,
+                'total_s': round(stats.seconds, 3),
+            })
+        return rows
+
+    def print_summary(self):
+        print("Strategy stats (evaluation order):")
+        for row in self.summary():
+            print(f"  {row['strategy']:<20} checks={row['checks']:<6} cached={row['cached']:<6} passed={row['passed']:<6} "
+                  f"pass_rate={row['pass_rate']}  avg_ms={row['avg_ms']}  total_s={row['total_s']}")
+
+    def screen_panel(self, codes, bars):
+        """
+        Run every strategy that supports screen() over the panel of a batch of stocks.
         
+        :return: dict strategy -> (mask, details), restricted to codes with all of the
+                 strategy's warm-up bars present on the panel's last dates. Other codes
+                 (suspended, newly listed) are left to check() so results match exactly.
+        """
+        panel = build_panel(codes, bars, self.fields)
+        if panel is None:
+            return {}
+        return self._screen(panel)
+
+    def _screen(self, panel, strategies=None):
+        """screen() every strategy supporting it over a built panel, as of its last row."""
+        screened = {}
+        for strategy in self.strategies if strategies is None else strategies:
+            with profiler.timer(f"screen.{strategy.name}"):
+                res = strategy.screen(panel)
+            if res is None:
+                continue
+            mask, details = res
+            window = panel['close'].iloc[-strategy.min_bars:]
+            if len(window) < strategy.min_bars:
+                continue
+            complete = window.notna().all()
+            mask = mask[complete].fillna(False).astype(bool)
+            screened[strategy] = (mask, details[complete])
+            profiler.count(f"screen.{strategy.name}.rows", len(mask))
+            profiler.count(f"screen.{strategy.name}.passed", int(mask.sum()))
+        return screened
+
+    def _screen_range(self, panel):
+        """
+        screen_range() every strategy supporting it over a built panel, on every row.
+        
+        :return: dict strategy -> (mask, details, complete); complete marks the codes with
+                 all of the strategy's warm-up bars present on the min_bars rows up to each row
+        """
+        ranged = {}
+        present = panel['close'].notna()
         for strategy in self.strategies:
-            is_match, details = strategy.check(code, df)
-            
-            if not is_match:
-                # If ANY strategy fails, the stock is rejected (AND logic)
-                return None
+            with profiler.timer(f"screen.{strategy.name}"):
+                res = strategy.screen_range(panel)
+            if res is None:
+                continue
+            mask, details = res
+            complete = present.rolling(strategy.min_bars).sum().eq(strategy.min_bars)
+            ranged[strategy] = (mask, details, complete)
+        return ranged
+
+    def scan_chunk(self, codes, date, workers=None):
+        """
+        Scan a chunk of stocks with every strategy (Union / OR logic).
+        
+        :return: (results in code order, strategy name -> StrategyStats for this chunk)
+        """
+        stats = {s.name: StrategyStats(s.cost) for s in self.strategies}
+        with profiler.timer('engine.fetch'):
+            bars = data_provider.get_daily_bars_many(codes, date, lookback_bars=self.lookback_bars,
+                                                     fields=self.fields, workers=workers)
+        # Vectorized pass for strategies implementing screen(); check() covers the rest
+        with profiler.timer('engine.panel'):
+            screened = self.screen_panel(codes, bars)
+        
+        results = []
+        for code, df in zip(codes, bars):
+            if df is None or df.empty:
+                continue
+                
+            indicators = self.indicators.get(code, df)
+            for strategy in self.strategies:
+                if strategy in screened and code in screened[strategy][0].index:
+                    mask, screen_details = screened[strategy]
+                    is_match = mask[code]
+                    details = screen_details.loc[code].to_dict() if is_match else {}
+                else:
+                    is_match, details = self._check(strategy, code, df, date, indicators, stats)
+                
+                if is_match:
+                    res = {
+                        'code': code,
+                        'strategy': strategy.name,
+                        'date': date
+                    }
+                    res.update(details)
+                    results.append(res)
+        return results, stats
+
+    def scan_range_chunk(self, codes, dates, workers=None):
+        """
+        Scan a chunk of stocks as of every date in dates (Union / OR logic).
+        Each stock's bars are loaded once for the union window. Strategies implementing
+        screen_range() are evaluated once over the whole window with rolling ops and read
+        back by date; screen() of the others runs on each date's slice of the panel, and
+        check() covers what neither screens. Each date sees exactly the bars a single-date
+        scan would: a rolling window of min_bars rows ending on the date's last panel row is
+        the last min_bars rows of that date's slice.
+        
+        :param dates: Consecutive trading days, ascending
+        :return: (results ordered by date then code, strategy name -> StrategyStats for this chunk)
+        """
+        stats = {s.name: StrategyStats(s.cost) for s in self.strategies}
+        with profiler.timer('engine.fetch'):
+            bars = data_provider.get_daily_bars_many(codes, dates[-1], lookback_bars=self.lookback_bars + len(dates) - 1,
+                                                     fields=self.fields, workers=workers)
+        with profiler.timer('engine.panel'):
+            panel = build_panel(codes, bars, self.fields)
+            ranged = {} if panel is None else self._screen_range(panel)
+        per_date = [s for s in self.strategies if s not in ranged]
+        bar_dates = [None if df is None or df.empty else df['date'].to_numpy(dtype=str) for df in bars]
+        panel_dates = None if panel is None else panel['close'].index.to_numpy(dtype=str)
+        
+        results = []
+        for date in dates:
+            # Window a single-date scan would fetch: the last lookback_bars trading days up to date
+            window_start = data_provider.calendar.offset(date, -(self.lookback_bars - 1))
             
-            # Accumulate details and strategy names
-            combined_details['strategy'].append(strategy.name)
-            combined_details.update(details)
+            screened = {}
+            if panel is not None:
+                lo = np.searchsorted(panel_dates, window_start, side='left')
+                hi = np.searchsorted(panel_dates, date, side='right')
+                for strategy, (mask, details, complete) in ranged.items():
+                    if hi - lo < strategy.min_bars:
+                        continue
+                    ok = complete.iloc[hi - 1]
+                    row_mask = mask.iloc[hi - 1][ok].fillna(False).astype(bool)
+                    row_details = pd.DataFrame({name: frame.iloc[hi - 1] for name, frame in details.items()})[ok]
+                    screened[strategy] = (row_mask, row_details)
+                    profiler.count(f"screen.{strategy.name}.rows", len(row_mask))
+                    profiler.count(f"screen.{strategy.name}.passed", int(row_mask.sum()))
+                if per_date and hi > lo:
+                    screened.update(self._screen({field: frame.iloc[lo:hi] for field, frame in panel.items()},
+                                                 per_date))
             
-        # If loop finishes, all strategies matched
-        combined_details['strategy'] = ", ".join(combined_details['strategy'])
-        return combined_details
+            for code, df, stock_dates in zip(codes, bars, bar_dates):
+                if stock_dates is None:
+                    continue
+                lo = np.searchsorted(stock_dates, window_start, side='left')
+                hi = np.searchsorted(stock_dates, date, side='right')
+                if hi <= lo:
+                    continue
+                
+                df_date = None
+                for strategy in self.strategies:
+                    if strategy in screened and code in screened[strategy][0].index:
+                        mask, screen_details = screened[strategy]
+                        is_match = mask[code]
+                        details = screen_details.loc[code].to_dict() if is_match else {}
+                    else:
+                        if df_date is None:
+                            df_date = df.iloc[lo:hi].reset_index(drop=True)
+                            indicators = self.indicators.get(code, df_date)
+                        is_match, details = self._check(strategy, code, df_date, date, indicators, stats)
+                    
+                    if is_match:
+                        res = {
+                            'code': code,
+                            'strategy': strategy.name,
+                            'date': date
+                        }
+                        res.update(details)
+                        results.append(res)
+        return results, stats
+
+    def _scan_dates(self, codes, dates, workers=None):
+        if len(dates) == 1:
+            return self.scan_chunk(codes, dates[0], workers)
+        return self.scan_range_chunk(codes, dates, workers)
+
+    def _map_chunks(self, chunks, stock_pool, dates, workers, executor):
+        """Yield scan results for each chunk in chunk order, fanned out over the chosen executor."""
+        if not workers or workers <= 1 or len(chunks) <= 1:
+            # Serial scan; bars are still fetched through the provider's session pool
+            for codes in chunks:
+                yield self._scan_dates(codes, dates, workers)
+        elif executor == 'thread':
+            # Threads share the provider's session pool for fetching and run checks concurrently;
+            # they profile into the caller's active profiler
+            active = current_profiler()
+
+            def scan(codes):
+                with active.activate():
+                    return self._scan_dates(codes, dates, workers)
+
+            with ThreadPoolExecutor(workers) as pool:
+                yield from pool.map(scan, chunks)
+        elif executor == 'process':
+            # Each process owns a baostock session and runs fetch and check for whole chunks
+            with Pool(workers, initializer=_init_engine_worker,
+                      initargs=(self, stock_pool, dates, profiler.enabled)) as pool:
+                for results, stats, entries, profile in pool.imap(_scan_chunk_task, [(codes, dates) for codes in chunks]):
+                    if self.result_cache is not None:
+                        self.result_cache.merge(entries)
+                    profiler.merge(profile)
+                    yield results, stats
+        else:
+            raise ValueError(f"Unknown executor: {executor}")
+
+    def iter_run(self, stock_pool, date, progress_callback=None, workers=None, executor='process', checkpoint=None):
+        """
+        Scan the stock pool (Union / OR logic), yielding result dicts as each chunk finishes.
+        
+        :param workers: Number of parallel workers; None scans serially, fetching through the provider's session pool
+        :param executor: 'process' (one baostock session per worker) or 'thread'
+        :param checkpoint: Optional ScanCheckpoint; codes it has already processed are skipped
+                           (their saved results are yielded first) and progress is saved to it
+        :return: generator of result dicts, in stock pool order whatever the executor
+        """
+        total = len(stock_pool)
+        pending = stock_pool
+        if checkpoint is not None and checkpoint.processed:
+            pending = [code for code in stock_pool if code not in checkpoint.processed]
+            print(f"Resuming from checkpoint: {total - len(pending)}/{total} stocks already scanned.")
+            yield from checkpoint.results
+        
+        print(f"Engine started. Scanning {len(pending)} stocks with {len(self.strategies)} strategies...")
+        self.prepare(pending, date)
+        
+        chunk_size = max(10, (workers or data_provider.workers) * 10)
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        
+        done = total - len(pending)
+        try:
+            for codes, (chunk_results, chunk_stats) in zip(chunks, self._map_chunks(chunks, pending, [date], workers, executor)):
+                for name, stats in chunk_stats.items():
+                    self.stats[name].merge(stats)
+                
+                if checkpoint is not None:
+                    checkpoint.update(codes, chunk_results)
+                    checkpoint.maybe_save()
+                if self.result_cache is not None:
+                    self.result_cache.maybe_flush()
+                
+                done += len(codes)
+                print(f"Progress: {done}/{total} ({round(done/total*100, 1)}%)", end="\r")
+                if progress_callback:
+                    progress_callback(done / total)
+                
+                yield from chunk_results
+        finally:
+            # Keep what was computed even if the scan is interrupted
+            if self.result_cache is not None:
+                self.result_cache.flush()
+                    
+        print(f"Progress: {total}/{total} (100%)")
+        if checkpoint is not None:
+            checkpoint.clear()
+        self.print_summary()
 
+    def run(self, stock_pool, date, progress_callback=None, workers=None, executor='process', checkpoint=None):
+        """Scan the stock pool and return all results as a list (see iter_run)."""
+        return list(self.iter_run(stock_pool, date, progress_callback, workers, executor, checkpoint))
 
-    def run(self, stock_pool, date, progress_callback=None):
+    def run_range(self, stock_pool, start_date, end_date, progress_callback=None, workers=None, executor='process'):
+        """
+        Scan the stock pool as of every trading day in [start_date, end_date] (Union / OR logic),
+        loading each stock's bars once for the whole range.
+        
+        :return: selection history, a list of result dicts ordered by date, then stock pool order
+        """
+        dates = [str(d) for d in data_provider.calendar.slice(start_date, end_date)]
+        if not dates:
+            print(f"No trading days between {start_date} and {end_date}.")
+            return []
+        total = len(stock_pool)
+        
+        print(f"Engine started. Scanning {total} stocks over {len(dates)} trading days "
+              f"({dates[0]} ~ {dates[-1]}) with {len(self.strategies)} strategies...")
+        for date in dates:
+            self.prepare(stock_pool, date)
+        
+        chunk_size = max(10, (workers or data_provider.workers) * 10)
+        chunks = [stock_pool[i:i + chunk_size] for i in range(0, total, chunk_size)]
+        
         results = []
+        done = 0
+        try:
+            for codes, (chunk_results, chunk_stats) in zip(chunks, self._map_chunks(chunks, stock_pool, dates, workers, executor)):
+                results.extend(chunk_results)
+                for name, stats in chunk_stats.items():
+                    self.stats[name].merge(stats)
+                if self.result_cache is not None:
+                    self.result_cache.maybe_flush()
+                
+                done += len(codes)
+                print(f"Progress: {done}/{total} ({round(done/total*100, 1)}%)", end="\r")
+                if progress_callback:
+                    progress_callback(done / total)
+        finally:
+            if self.result_cache is not None:
+                self.result_cache.flush()
+        
+        print(f"Progress: {total}/{total} (100%)")
+        self.print_summary()
+        # Chunks come back code-major; a stable sort restores (date, pool order, strategy)
+        results.sort(key=lambda res: res['date'])
+        return results
+
+    def rolling_store(self):
+        """A RollingStateStore sized for the active strategies (lookback bars, fields, moving-average windows)."""
+        windows = [window for strategy in self.strategies for window in strategy.rolling_windows]
+        return RollingStateStore(self.fields, self.lookback_bars, windows)
+
+    def run_incremental(self, stock_pool, date, progress_callback=None, workers=None, store=None):
+        """
+        Scan the stock pool (Union / OR logic) from persisted per-stock rolling state.
+        
+        Each stock's state is advanced by the bars since its last update (one on a daily
+        re-screen; a bar of the same date is replaced, for intraday reruns) and strategies
+        read it through check_state(), so the work per stock does not grow with the
+        lookback. Stocks without state, or with state newer than date, are rebuilt
+        from a full lookback fetch. Strategies without check_state() get check() on
+        the state's bars.
+        """
+        if store is None:
+            with profiler.timer('rolling_state.load'):
+                store = self.rolling_store().load()
+        calendar = data_provider.calendar
+        window_start = calendar.offset(date, -(self.lookback_bars - 1))
         total = len(stock_pool)
         
-        print(f"Engine started. Scanning {total} stocks with {len(self.strategies)} strategies...")
+        print(f"Engine started. Incremental scan of {total} stocks with {len(self.strategies)} strategies...")
+        self.prepare(stock_pool, date)
         
+        # Bars each stock still needs: trading days since its last bar (capped at a full window)
+        needs = {}
+        for code in stock_pool:
+            state = store.states.get(code)
+            if state is not None and len(state) and state.last_date == date:
+                state.pop_right()
+            if state is None or not len(state) or state.last_date > date:
+                need = self.lookback_bars
+            else:
+                need = min(len(calendar.slice(state.last_date, date)) - 1, self.lookback_bars)
+            if need >= self.lookback_bars:
+                store.states[code] = store.new_state()
+            if need > 0:
+                needs.setdefault(need, []).append(code)
+        
+        for need, codes in needs.items():
+            print(f"Fetching {need} bar(s) for {len(codes)} stocks...")
+            with profiler.timer('engine.fetch'):
+                bars = data_provider.get_daily_bars_many(codes, date, lookback_bars=need, fields=self.fields, workers=workers)
+            bars = [(code, df) for code, df in zip(codes, bars) if df is not None and not df.empty]
+            if not bars:
+                continue
+            # One conversion for the whole group rather than one per stock
+            new = pd.concat([df.assign(code=code) for code, df in bars], ignore_index=True)
+            for bar in new.to_dict('records'):
+                store.push(bar['code'], bar)
+        
+        results = []
         for i, code in enumerate(stock_pool):
-            if i % 10 == 0:
-                print(f"Progress: {i}/{total} ({round(i/total*100, 1)}%)", end="\r")
-            
-            if progress_callback:
+            if progress_callback and i % 100 == 0:
                 progress_callback(i / total)
-            
-            # Fetch data once per stock
-            # Using a default lookback of 60 days, sufficient for most daily strategies
-            df = data_provider.get_daily_bars(code, date)
-            
-            if df is None or df.empty:
+            state = store.states.get(code)
+            if state is None:
                 continue
-                
+            state.drop_before(window_start)
+            if not len(state):
+                continue
+            
+            df = None
             for strategy in self.strategies:
-                is_match, details = strategy.check(code, df)
+                start = time.perf_counter()
+                res = strategy.check_state(code, state)
+                if res is not None:
+                    is_match, details = res
+                    elapsed = time.perf_counter() - start
+                    self.stats[strategy.name].record(is_match, elapsed)
+                    profiler.add_time(f"check_state.{strategy.name}", elapsed)
+                else:
+                    if df is None:
+                        df = state.frame()
+                    is_match, details = self._check(strategy, code, df, date, self.indicators.get(code, df))
                 
                 if is_match:
                     res = {
@@ -65,6 +623,11 @@ class AnalysisEngine:
                     }
                     res.update(details)
                     results.append(res)
-                    
+        
+        with profiler.timer('rolling_state.save'):
+            store.save()
+        if self.result_cache is not None:
+            self.result_cache.flush()
         print(f"Progress: {total}/{total} (100%)")
+        self.print_summary()
         return results
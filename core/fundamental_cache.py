@@ -0,0 +1,52 @@
+import os
+import json
+import time
+from utils.file_io import get_cache_dir
+from core.result_parser import to_frame
+
+
+# Seconds a "not yet published" answer is trusted before the report is queried again
+MISSING_TTL = 24 * 3600
+
+
+class FundamentalCache:
+    """
+    Persistent cache for quarterly report queries, keyed by (query type, code, year, quarter).
+    Published reports never change, so found entries are kept forever.
+    "Not yet published" answers are cached too, but expire after missing_ttl seconds.
+    """
+
+    def __init__(self, root=None, missing_ttl=MISSING_TTL):
+        self.root = root or get_cache_dir('fundamentals')
+        self.missing_ttl = missing_ttl
+
+    def _path(self, query_type, code, year, quarter):
+        return os.path.join(self.root, query_type, f"{year}Q{quarter}", f"{code}.json")
+
+    def get(self, query_type, code, year, quarter):
+        """
+        Look up a cached answer.
+        :return: (hit, df) -> df is empty for a cached "not published" answer
+        """
+        path = self._path(query_type, code, year, quarter)
+        if not os.path.exists(path):
+            return False, None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except Exception:
+            return False, None
+
+        if not entry['rows']:
+            if time.time() - entry['fetched_at'] > self.missing_ttl:
+                return False, None
+            return True, to_frame(entry['fields'], [], query_type)
+        return True, to_frame(entry['fields'], entry['rows'], query_type)
+
+    def put(self, query_type, code, year, quarter, fields, rows):
+        path = self._path(query_type, code, year, quarter)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {'fields': list(fields), 'rows': rows, 'fetched_at': time.time()}
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
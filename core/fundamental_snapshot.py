@@ -0,0 +1,109 @@
+import os
+import time
+import pandas as pd
+from core.data_provider import data_provider
+from core.fundamental_cache import MISSING_TTL
+from utils.file_io import get_cache_dir
+
+# Snapshot table name -> provider method
+TABLES = {
+    'growth': 'get_growth_data',
+    'profit': 'get_profit_data',
+    'balance': 'get_balance_data',
+    'operation': 'get_operation_data',
+}
+
+
+class FundamentalSnapshot:
+    """
+    Quarterly fundamentals for a whole universe, one DataFrame per table indexed by code.
+
+    Snapshots are kept in memory per (year, quarter) and as Parquet files on disk,
+    so strategies can look a stock up with a hash-index access instead of a query.
+    """
+    _loaded = {}  # (year, quarter) -> FundamentalSnapshot
+
+    def __init__(self, year, quarter):
+        self.year = str(year)
+        self.quarter = str(quarter)
+        self.frames = {}       # table -> DataFrame indexed by code
+        self.codes = {}        # table -> set of codes answered (report or "not published")
+        self.unpublished = {}  # table -> {code: time the "not published" answer was recorded}
+
+    @classmethod
+    def active(cls, year, quarter):
+        """The snapshot loaded for a report period, or None."""
+        return cls._loaded.get((str(year), str(quarter)))
+
+    @classmethod
+    def load(cls, universe, year, quarter, tables=('growth', 'profit', 'balance', 'operation'), workers=None):
+        """
+        Load the given tables for every code in the universe.
+        Rows already in memory or on disk are reused; only missing codes are fetched,
+        in parallel through the provider's session pool.
+        """
+        key = (str(year), str(quarter))
+        snapshot = cls._loaded.get(key) or cls(year, quarter)
+        cls._loaded[key] = snapshot
+        for table in tables:
+            snapshot._load_table(table, universe, workers)
+        return snapshot
+
+    def _path(self, table):
+        return os.path.join(get_cache_dir('snapshots', f"{self.year}Q{self.quarter}"), f"{table}.parquet")
+
+    def _load_table(self, table, universe, workers):
+        if table not in self.frames:
+            path = self._path(table)
+            self.frames[table] = pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame()
+            self.codes[table] = set(self.frames[table].index)
+
+        missing = [code for code in dict.fromkeys(universe) if not self.has(table, code)]
+        if not missing:
+            return
+
+        print(f"Loading {table} data for {len(missing)} stocks ({self.year}Q{self.quarter})...")
+        results = data_provider.call_many(TABLES[table], [(code, self.year, self.quarter) for code in missing],
+                                          workers=workers)
+        unpublished = self.unpublished.setdefault(table, {})
+        now = time.time()
+        for code, df in zip(missing, results):
+            # Failed queries (None) stay missing so the next load() retries them
+            if df is None:
+                continue
+            self.codes[table].add(code)
+            if df.empty:
+                unpublished[code] = now
+            else:
+                unpublished.pop(code, None)
+        rows = [df.iloc[[0]] for df in results if df is not None and not df.empty]
+        if not rows:
+            return
+
+        new = pd.concat(rows, ignore_index=True).set_index('code')
+        frame = pd.concat([self.frames[table], new]) if not self.frames[table].empty else new
+        self.frames[table] = frame[~frame.index.duplicated(keep='last')]
+        self.frames[table].to_parquet(self._path(table))
+
+    def has(self, table, code):
+        """
+        Whether the table was loaded for this code (whether or not a report exists).
+        A "not published" answer counts only until the fundamental cache's TTL expires,
+        so a long-running process picks up reports published since.
+        """
+        if code not in self.codes.get(table, ()):
+            return False
+        checked = self.unpublished.get(table, {}).get(code)
+        return checked is None or time.time() - checked <= self._missing_ttl()
+
+    @staticmethod
+    def _missing_ttl():
+        cache = data_provider.fundamental_cache
+        return cache.missing_ttl if cache is not None else MISSING_TTL
+
+    def row(self, table, code):
+        """The report row for a code as a Series, or None if it has not been published."""
+        frame = self.frames.get(table)
+        if frame is None or code not in frame.index:
+            return None
+        return frame.loc[code]
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+
+class StockIndicators:
+    """
+    Technical indicators over one stock's bars, each (indicator, column, window)
+    computed on first use and reused by every strategy that asks for it.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._memo = {}
+
+    def _get(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def ma(self, column, window):
+        """Simple moving average, aligned with the bars (NaN during warm-up)."""
+        return self._get(('ma', column, window), lambda: self.df[column].rolling(window=window).mean())
+
+    def rsi(self, window=14):
+        """Simple (rolling mean) RSI of the close price."""
+        def compute():
+            delta = self.df['close'].diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+            rs = gain / loss
+            return 100 - (100 / (1 + rs))
+        return self._get(('rsi', 'close', window), compute)
+
+
+class IndicatorCache:
+    """
+    Per-stock StockIndicators, keyed by code and the bars they were computed on.
+    The key holds the bar window and the values of the last bar, so an intraday
+    refresh of today's bar gets fresh indicators.
+    Least recently used stocks are dropped beyond maxsize (None keeps everything).
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, code, df):
+        """Indicators for a stock's (non-empty) bars; a different bar window gets its own entry."""
+        # Values as strings so NaN compares equal to itself
+        last = tuple(str(v) for v in df.iloc[-1].tolist())
+        key = (code, tuple(df.columns), len(df), str(df['date'].iloc[0]), last)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = StockIndicators(df)
+                self._entries[key] = entry
+                if self.maxsize is not None and len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __getstate__(self):
+        # Sent to worker processes empty; locks cannot be pickled
+        return {'maxsize': self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state['maxsize'])
+
+
+# Shared cache for long-lived processes (the web UI), bounded so memory stays flat
+indicator_cache = IndicatorCache(maxsize=512)
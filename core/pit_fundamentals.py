@@ -0,0 +1,120 @@
+import bisect
+import datetime
+import pandas as pd
+from core.fundamental_snapshot import FundamentalSnapshot
+
+
+def candidate_periods(date_str, count=3):
+    """
+    The last `count` quarter-ends strictly before date_str, as (year, quarter) strings.
+    A report is due within four months of its quarter-end, so the latest report
+    published by any date is always one of the last three quarters.
+    """
+    dt = datetime.datetime.strptime(date_str, "%Y-%m-%d")
+    year, quarter = dt.year, (dt.month - 1) // 3 + 1
+    periods = []
+    for _ in range(count):
+        quarter -= 1
+        if quarter == 0:
+            year, quarter = year - 1, 4
+        periods.append((str(year), str(quarter)))
+    return periods
+
+
+def period_of(stat_date):
+    """'2024-06-30' -> ('2024', '2')"""
+    year, month = stat_date[:4], int(stat_date[5:7])
+    return year, str((month - 1) // 3 + 1)
+
+
+class PointInTimeIndex:
+    """
+    Point-in-time view of one quarterly report table.
+
+    Every report row is indexed by its publication date (pubDate), per code, in a
+    sorted list, so "latest report known as of date D" is a bisect lookup. Reports are
+    not always published in period order (an annual report can come out after the next
+    Q1), so alongside the rows each code keeps a running max by statDate. The rows
+    themselves come from FundamentalSnapshot, which persists them per report period.
+    """
+    _indexes = {}  # table -> PointInTimeIndex
+
+    def __init__(self, table):
+        self.table = table
+        self._pub_dates = {}   # code -> sorted list of pubDate
+        self._rows = {}        # code -> rows aligned with _pub_dates
+        self._latest = {}      # code -> latest-statDate row among _rows[:i + 1], aligned with _pub_dates
+        self._seen = set()     # (code, statDate) already indexed
+        self._periods = set()  # (year, quarter) whose snapshot rows are indexed
+
+    @classmethod
+    def get(cls, table):
+        return cls._indexes.get(table)
+
+    @classmethod
+    def load(cls, table, universe, periods, workers=None):
+        """Make sure the given report periods are indexed for every code in the universe."""
+        index = cls._indexes.get(table) or cls(table)
+        cls._indexes[table] = index
+        for year, quarter in periods:
+            if (year, quarter) in index._periods and index._answered(universe, year, quarter):
+                continue
+            # The snapshot only fetches codes it has no answer for: failed queries and
+            # "not published" answers older than the fundamental cache's TTL
+            snapshot = FundamentalSnapshot.load(universe, year, quarter, tables=[table], workers=workers)
+            frame = snapshot.frames.get(table)
+            if frame is not None and not frame.empty:
+                index._add_rows(frame)
+            index._periods.add((year, quarter))
+        return index
+
+    def _answered(self, codes, year, quarter):
+        snapshot = FundamentalSnapshot.active(year, quarter)
+        return snapshot is not None and all(snapshot.has(self.table, code) for code in codes)
+
+    def _add_rows(self, frame):
+        for code, row in frame.iterrows():
+            pub_date, stat_date = row.get('pubDate'), row.get('statDate')
+            if not isinstance(pub_date, str) or not pub_date or (code, stat_date) in self._seen:
+                continue
+            self._seen.add((code, stat_date))
+            dates = self._pub_dates.setdefault(code, [])
+            rows = self._rows.setdefault(code, [])
+            pos = bisect.bisect_right(dates, pub_date)
+            dates.insert(pos, pub_date)
+            rows.insert(pos, row)
+            self._latest[code] = self._running_latest(rows)
+
+    @staticmethod
+    def _running_latest(rows):
+        latest, best = [], None
+        for row in rows:
+            if best is None or row['statDate'] > best['statDate']:
+                best = row
+            latest.append(best)
+        return latest
+
+    def covers(self, code, date_str):
+        """
+        Whether every candidate period for date_str has been loaded for this code.
+        Codes whose query failed, or whose "not published" answer has expired, are not covered.
+        """
+        return all(period in self._periods and self._answered([code], *period)
+                   for period in candidate_periods(date_str))
+
+    def as_of(self, code, date_str):
+        """Report row for the latest period (statDate) published on or before date_str, or None."""
+        dates = self._pub_dates.get(code)
+        if not dates:
+            return None
+        pos = bisect.bisect_right(dates, date_str) - 1
+        return self._latest[code][pos] if pos >= 0 else None
+
+    def as_of_many(self, codes, date_str):
+        """As-of rows for many codes as a DataFrame indexed by code (codes without a report are omitted)."""
+        rows = {}
+        for code in codes:
+            row = self.as_of(code, date_str)
+            if row is not None:
+                rows[code] = row
+        return pd.DataFrame.from_dict(rows, orient='index')
@@ -0,0 +1,142 @@
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Profiler that `profiler` routes to in the current context (see Profiler.activate)
+_current = contextvars.ContextVar('profiler')
+
+
+class Profiler:
+    """
+    Lightweight named timers and counters for finding where a scan spends its time.
+
+    Disabled by default: timer() and count() then cost a single attribute check.
+    Worker processes profile into their own instance and send drain() back to the
+    parent, which merge()s it. A caller that must not share numbers with the rest
+    of the process (a web UI session) activate()s its own instance.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._timers = {}    # name -> [count, total seconds, max seconds]
+        self._counters = {}  # name -> count
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        return self
+
+    @contextmanager
+    def activate(self):
+        """Route the module-level `profiler` to this instance in the current thread / context."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def add_time(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            timer = self._timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    @contextmanager
+    def timer(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def drain(self):
+        """Raw timers and counters collected since the last drain (None when disabled)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            data = {'timers': self._timers, 'counters': self._counters}
+            self._timers, self._counters = {}, {}
+        return data
+
+    def merge(self, data):
+        """Add what drain() returned in another process."""
+        if not data or not self.enabled:
+            return
+        with self._lock:
+            for name, (count, total, longest) in data['timers'].items():
+                timer = self._timers.setdefault(name, [0, 0.0, 0.0])
+                timer[0] += count
+                timer[1] += total
+                timer[2] = max(timer[2], longest)
+            for name, n in data['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._timers, self._counters = {}, {}
+
+    def report(self, strategies=None):
+        """
+        Machine-readable report: timers (count, total_s, mean_ms, max_ms) and counters,
+        plus per-strategy stats when given (AnalysisEngine.summary()).
+        """
+        with self._lock:
+            timers = {
+                name: {
+                    'count': count,
+                    'total_s': round(total, 4),
+                    'mean_ms': round(total / count * 1000, 3) if count else None,
+                    'max_ms': round(longest * 1000, 3),
+                }
+                for name, (count, total, longest) in sorted(self._timers.items())
+            }
+            counters = dict(sorted(self._counters.items()))
+        report = {'timers': timers, 'counters': counters}
+        if strategies is not None:
+            report['strategies'] = strategies
+        return report
+
+    def print_report(self, strategies=None):
+        report = self.report(strategies)
+        print("Profile (timers):")
+        for name, t in report['timers'].items():
+            print(f"  {name:<36} count={t['count']:<7} total_s={t['total_s']:<9} "
+                  f"mean_ms={t['mean_ms']:<9} max_ms={t['max_ms']}")
+        print("Profile (counters):")
+        for name, n in report['counters'].items():
+            print(f"  {name:<36} {n}")
+
+    def save_json(self, path, strategies=None):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(strategies), f, ensure_ascii=False, indent=2)
+
+
+class _ActiveProfiler:
+    """Forwards to the profiler activated in the current context, else the process-wide one."""
+
+    def __getattr__(self, name):
+        return getattr(current(), name)
+
+
+def current():
+    """The Profiler that `profiler` currently routes to."""
+    return _current.get(_default)
+
+
+# Process-wide profiler, enabled by main.py --profile; web UI sessions activate their own
+_default = Profiler()
+profiler = _ActiveProfiler()
@@ -0,0 +1,94 @@
+import os
+from multiprocessing import Pool
+from core.profiler import profiler
+
+# Per-process provider, created by the pool initializer (one baostock login per worker)
+_worker_provider = None
+
+
+def _init_worker(use_bar_store, profile=False):
+    global _worker_provider
+    from core.data_provider import BaostockProvider
+    profiler.enable(profile)
+    _worker_provider = BaostockProvider(use_bar_store=use_bar_store)
+    _worker_provider.login()
+
+
+def _fetch_daily_bars(args):
+    code, end_date, kwargs = args
+    try:
+        return _worker_provider.get_daily_bars(code, end_date, **kwargs), None, profiler.drain()
+    except Exception as e:
+        return None, str(e), profiler.drain()
+
+
+def _call_provider(method, args, kwargs):
+    """Call a provider method inside a worker process (used by executors)."""
+    return getattr(_worker_provider, method)(*args, **kwargs)
+
+
+def _call_provider_safe(call):
+    method, args = call
+    try:
+        return getattr(_worker_provider, method)(*args), None, profiler.drain()
+    except Exception as e:
+        return None, str(e), profiler.drain()
+
+
+class ProviderPool:
+    """
+    A pool of worker processes, each holding its own baostock session.
+    The baostock client keeps one global socket per process, so parallel
+    queries need separate processes rather than threads.
+    """
+
+    def __init__(self, workers=None, use_bar_store=True, profile=False):
+        self.workers = workers or min(os.cpu_count() or 1, 8)
+        self.use_bar_store = use_bar_store
+        # Workers profile too and send their timings back with each result
+        self.profile = profile
+        self._pool = None
+
+    def start(self):
+        if self._pool is None:
+            self._pool = Pool(self.workers, initializer=_init_worker, initargs=(self.use_bar_store, self.profile))
+        return self
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def imap(self, func, args_list):
+        """Apply func to each item in order; results are yielded in input order."""
+        self.start()
+        chunksize = max(1, len(args_list) // (self.workers * 4))
+        return self._pool.imap(func, args_list, chunksize=chunksize)
+
+    def call_many(self, method, args_list):
+        """
+        Call a provider method once per args tuple, in parallel.
+        Returns results in input order; a failed call yields None.
+        """
+        results = []
+        for args, (res, error, profile) in zip(args_list, self.imap(_call_provider_safe, [(method, a) for a in args_list])):
+            profiler.merge(profile)
+            if error:
+                print(f"Error calling {method}{tuple(args)}: {error}")
+            results.append(res)
+        return results
+
+    def get_daily_bars_many(self, codes, end_date, **kwargs):
+        """
+        Fetch daily bars for many codes in parallel (kwargs are passed to get_daily_bars).
+        Returns a list aligned with codes; a failed code yields None without affecting the others.
+        """
+        args_list = [(code, end_date, kwargs) for code in codes]
+        results = []
+        for code, (df, error, profile) in zip(codes, self.imap(_fetch_daily_bars, args_list)):
+            profiler.merge(profile)
+            if error:
+                print(f"Error fetching daily bars for {code}: {error}")
+            results.append(df)
+        return results
@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+from core.data_provider import BaostockProvider
+from core.result_parser import fetch_rows
+
+
+class RecordedResult:
+    """Stand-in for baostock ResultData holding a fully materialized response."""
+
+    def __init__(self, error_code, error_msg, fields, rows):
+        self.error_code = error_code
+        self.error_msg = error_msg
+        self.fields = fields
+        self.data = rows
+        self.cur_row_num = 0
+
+    def next(self):
+        return self.cur_row_num < len(self.data)
+
+    def get_row_data(self):
+        row = self.data[self.cur_row_num]
+        self.cur_row_num += 1
+        return row
+
+
+def _fixture_path(fixture_dir, method, args, kwargs):
+    key = json.dumps([method, list(args), sorted(kwargs.items())], ensure_ascii=False)
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(fixture_dir, method, f"{digest}.json")
+
+
+class RecordingClient:
+    """Wraps the baostock module and writes every query response to a fixture directory."""
+
+    def __init__(self, client, fixture_dir):
+        self.client = client
+        self.fixture_dir = fixture_dir
+
+    def login(self):
+        return self.client.login()
+
+    def logout(self):
+        return self.client.logout()
+
+    def __getattr__(self, name):
+        func = getattr(self.client, name)
+        if not name.startswith('query_'):
+            return func
+
+        def recorded(*args, **kwargs):
+            rs = func(*args, **kwargs)
+            rows = fetch_rows(rs)
+            entry = {
+                'method': name, 'args': list(args), 'kwargs': kwargs,
+                'error_code': rs.error_code, 'error_msg': rs.error_msg,
+                'fields': list(rs.fields), 'rows': rows,
+            }
+            path = _fixture_path(self.fixture_dir, name, args, kwargs)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            return RecordedResult(entry['error_code'], entry['error_msg'], entry['fields'], rows)
+
+        recorded.__name__ = name
+        return recorded
+
+
+class ReplayClient:
+    """Serves recorded query responses from a fixture directory without any network access."""
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+
+    def login(self):
+        return RecordedResult('0', 'success', [], [])
+
+    def logout(self):
+        return RecordedResult('0', 'success', [], [])
+
+    def __getattr__(self, name):
+        if not name.startswith('query_'):
+            raise AttributeError(name)
+
+        def replayed(*args, **kwargs):
+            path = _fixture_path(self.fixture_dir, name, args, kwargs)
+            if not os.path.exists(path):
+                return RecordedResult('REPLAY_MISSING', f"No recorded response for {name} {args} {kwargs}", [], [])
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            return RecordedResult(entry['error_code'], entry['error_msg'], entry['fields'], entry['rows'])
+
+        replayed.__name__ = name
+        return replayed
+
+
+class RecordingProvider(BaostockProvider):
+    """BaostockProvider that records every baostock response to fixture_dir."""
+
+    def __init__(self, fixture_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.use_fixtures(record_dir=fixture_dir)
+
+
+class ReplayProvider(BaostockProvider):
+    """BaostockProvider that serves responses recorded by RecordingProvider, fully offline."""
+
+    def __init__(self, fixture_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.use_fixtures(replay_dir=fixture_dir)
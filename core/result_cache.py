@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import threading
+from utils.file_io import get_cache_dir, json_default
+
+
+class ResultCache:
+    """
+    Persistent cache of check() outcomes, keyed by (strategy key, date, code).
+
+    The strategy key (see StockStrategy.cache_key) identifies the strategy and its
+    parameters; each entry also stores the fingerprint of the data it was computed
+    from and only counts as a hit while that fingerprint matches, so changed bars
+    or a newly published report invalidate it automatically.
+
+    Entries live in one JSON file per (strategy key, date), loaded on first use and
+    written back by flush().
+    """
+
+    def __init__(self, root=None, flush_interval=30):
+        self.root = root or get_cache_dir('results_cache')
+        # Minimum seconds between two writes from maybe_flush()
+        self.flush_interval = flush_interval
+        self._tables = {}    # (strategy key, date) -> {code: [fingerprint, is_match, details]}
+        self._dirty = set()
+        self._new = []       # entries added since the last drain()
+        self._flushed_at = time.time()
+        self._lock = threading.RLock()
+
+    def _path(self, strategy_key, date):
+        return os.path.join(self.root, strategy_key, f"{date}.json")
+
+    def _table(self, strategy_key, date):
+        key = (strategy_key, date)
+        with self._lock:
+            if key in self._tables:
+                return self._tables[key]
+            table = {}
+            path = self._path(strategy_key, date)
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        table = json.load(f)
+                except Exception as e:
+                    print(f"Error reading result cache {path}: {e}")
+            self._tables[key] = table
+            return table
+
+    def get(self, strategy_key, date, code, fingerprint):
+        """
+        Look up a cached outcome.
+        :return: (hit, is_match, details)
+        """
+        entry = self._table(strategy_key, date).get(code)
+        if entry is None or entry[0] != fingerprint:
+            return False, None, None
+        return True, entry[1], entry[2]
+
+    def put(self, strategy_key, date, code, fingerprint, is_match, details):
+        entry = [fingerprint, bool(is_match), details]
+        with self._lock:
+            self._table(strategy_key, date)[code] = entry
+            self._dirty.add((strategy_key, date))
+            self._new.append((strategy_key, date, code, entry))
+
+    def drain(self):
+        """Entries added since the last drain, e.g. to hand them from a worker process to the parent."""
+        with self._lock:
+            new, self._new = self._new, []
+            return new
+
+    def merge(self, entries):
+        """Add entries returned by drain() in another process."""
+        for strategy_key, date, code, entry in entries:
+            self.put(strategy_key, date, code, *entry)
+
+    def flush(self):
+        with self._lock:
+            for strategy_key, date in self._dirty:
+                path = self._path(strategy_key, date)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(self._tables[(strategy_key, date)], f, ensure_ascii=False, default=json_default)
+                os.replace(path + '.tmp', path)
+            self._dirty = set()
+            self._new = []
+            self._flushed_at = time.time()
+
+    def maybe_flush(self):
+        """Flush if the interval has elapsed since the last flush."""
+        if time.time() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def __getstate__(self):
+        # Worker processes start empty and load what they need from disk; locks cannot be pickled
+        return {'root': self.root, 'flush_interval': self.flush_interval}
+
+    def __setstate__(self, state):
+        self.__init__(state['root'], state['flush_interval'])
+
+
+# Shared cache for long-lived processes (the web UI)
+result_cache = ResultCache()
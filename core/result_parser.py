@@ -0,0 +1,123 @@
+import time
+import numpy as np
+import pandas as pd
+
+# Text columns per query type; every other field is decoded as float64.
+# Unknown query types keep all columns as text.
+TEXT_FIELDS = {
+    'query_history_k_data_plus': {'date', 'time', 'code', 'adjustflag', 'tradestatus', 'isST'},
+    'query_profit_data': {'code', 'pubDate', 'statDate'},
+    'query_operation_data': {'code', 'pubDate', 'statDate'},
+    'query_growth_data': {'code', 'pubDate', 'statDate'},
+    'query_balance_data': {'code', 'pubDate', 'statDate'},
+}
+
+
+def fetch_rows(rs):
+    """
+    Drain a baostock ResultData page by page instead of row by row.
+    :return: list of rows (each a list of strings); check rs.error_code for failures
+    """
+    rows = []
+    while rs.error_code == '0' and rs.data:
+        rows.extend(rs.data)
+        # Mark the current page as consumed so next() requests the following page
+        rs.cur_row_num = len(rs.data)
+        if not rs.next():
+            break
+    return rows
+
+
+def to_frame(fields, rows, query_type=None):
+    """
+    Build a typed DataFrame from raw baostock rows in one pass.
+    Rows are transposed once into columns; all numeric columns are then cast
+    together with a single 2-D float conversion, falling back per column only
+    when a column holds empty strings (which become NaN).
+    """
+    fields = list(fields)
+    if not rows:
+        return pd.DataFrame(columns=fields)
+
+    text_fields = TEXT_FIELDS.get(query_type)
+    cols = list(zip(*rows))
+    numeric_idx = [] if text_fields is None else [j for j, f in enumerate(fields) if f not in text_fields]
+
+    columns = {}
+    try:
+        block = np.array([cols[j] for j in numeric_idx], dtype=np.float64)
+        for k, j in enumerate(numeric_idx):
+            columns[fields[j]] = block[k]
+    except ValueError:
+        for j in numeric_idx:
+            try:
+                columns[fields[j]] = np.array(cols[j], dtype=np.float64)
+            except ValueError:
+                columns[fields[j]] = pd.to_numeric(np.array(cols[j], dtype=object), errors='coerce')
+
+    for j, field in enumerate(fields):
+        if field not in columns:
+            columns[field] = np.array(cols[j], dtype=object)
+    return pd.DataFrame(columns, columns=fields)
+
+
+def decode_result(rs, query_type=None):
+    """Decode a ResultData into a typed DataFrame, or None if the query failed."""
+    rows = fetch_rows(rs)
+    if rs.error_code != '0':
+        return None
+    return to_frame(rs.fields, rows, query_type)
+
+
+class _FakeResultData:
+    """Minimal stand-in for baostock ResultData, used by the benchmark."""
+
+    def __init__(self, fields, rows):
+        self.error_code = '0'
+        self.fields = fields
+        self.data = rows
+        self.cur_row_num = 0
+
+    def next(self):
+        return self.cur_row_num < len(self.data)
+
+    def get_row_data(self):
+        row = self.data[self.cur_row_num]
+        self.cur_row_num += 1
+        return row
+
+
+def benchmark(n_codes=300, n_bars=60):
+    """Compare the row-by-row parsing path with the bulk decoder on synthetic daily bars."""
+    from core.bar_store import DAILY_FIELDS, NUMERIC_COLS
+    fields = DAILY_FIELDS.split(',')
+    rng = np.random.default_rng(0)
+    pages = []
+    for i in range(n_codes):
+        values = rng.random((n_bars, len(NUMERIC_COLS))) * 100
+        rows = [[f"2024-01-{d % 28 + 1:02d}", f"sh.{600000 + i}"] + [f"{v:.4f}" for v in row] + ['0']
+                for d, row in enumerate(values)]
+        pages.append(rows)
+
+    t1 = time.time()
+    for rows in pages:
+        rs = _FakeResultData(fields, rows)
+        data_list = []
+        while (rs.error_code == '0') & rs.next():
+            data_list.append(rs.get_row_data())
+        df = pd.DataFrame(data_list, columns=rs.fields)
+        for col in NUMERIC_COLS:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    t2 = time.time()
+    for rows in pages:
+        decode_result(_FakeResultData(fields, rows), 'query_history_k_data_plus')
+    t3 = time.time()
+
+    print(f"Row-by-row parse: {t2 - t1:.3f}s")
+    print(f"Bulk decoder:     {t3 - t2:.3f}s")
+    print(f"Speedup:          {(t2 - t1) / max(t3 - t2, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    # python -m core.result_parser
+    benchmark()
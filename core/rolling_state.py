@@ -0,0 +1,285 @@
+import os
+import math
+import hashlib
+import numpy as np
+import pandas as pd
+from utils.file_io import get_cache_dir
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class RollingState:
+    """
+    The last `size` bars of one stock in a ring buffer, plus running sums for the
+    declared (field, window) pairs, so moving averages are read in O(1) and the
+    state is advanced one bar at a time instead of recomputed from the history.
+    """
+
+    def __init__(self, fields, size, windows):
+        self.fields = list(fields)
+        self.size = size
+        self.windows = list(windows)
+        self._dates = [None] * size
+        self._buf = {f: [None] * size for f in self.fields}
+        self._start = 0
+        self.count = 0
+        self._sums = {key: 0.0 for key in self.windows}
+        self._nans = {key: 0 for key in self.windows}
+        # Persistence bookkeeping for RollingStateStore
+        self.unsaved = 0        # newest bars not written yet
+        self.base = None        # store generation its saved bars start from (None: never saved)
+        self._dropped = set()   # saved bars dropped from the right and not pushed again
+
+    def __len__(self):
+        return self.count
+
+    def _pos(self, i):
+        """Buffer position of the i-th oldest bar."""
+        return (self._start + i) % self.size
+
+    def _add(self, key, value, sign):
+        if _missing(value):
+            self._nans[key] += sign
+        else:
+            self._sums[key] += sign * value
+
+    @property
+    def last_date(self):
+        return self._dates[self._pos(self.count - 1)] if self.count else None
+
+    @property
+    def first_date(self):
+        return self._dates[self._start] if self.count else None
+
+    def push(self, date, bar):
+        """Append the next bar (a dict of field -> value)."""
+        if self.count == self.size:
+            self.pop_left()
+        pos = self._pos(self.count)
+        self._dates[pos] = date
+        for f in self.fields:
+            self._buf[f][pos] = bar.get(f)
+        self.count += 1
+        self.unsaved = min(self.unsaved + 1, self.count)
+        self._dropped.discard(date)
+        for key in self.windows:
+            field, window = key
+            self._add(key, bar.get(field), 1)
+            if self.count > window:
+                self._add(key, self._buf[field][self._pos(self.count - 1 - window)], -1)
+
+    def pop_left(self):
+        """Drop the oldest bar."""
+        for key in self.windows:
+            field, window = key
+            if self.count <= window:
+                self._add(key, self._buf[field][self._start], -1)
+        self._start = (self._start + 1) % self.size
+        self.count -= 1
+        self.unsaved = min(self.unsaved, self.count)
+
+    def pop_right(self):
+        """Drop the newest bar (e.g. to replace an intraday bar with a fresher one)."""
+        for key in self.windows:
+            field, window = key
+            self._add(key, self._buf[field][self._pos(self.count - 1)], -1)
+            if self.count > window:
+                self._add(key, self._buf[field][self._pos(self.count - 1 - window)], 1)
+        if self.unsaved:
+            self.unsaved -= 1
+        else:
+            self._dropped.add(self.last_date)
+        self.count -= 1
+
+    def drop_before(self, date):
+        """Drop bars older than date (they left the lookback window)."""
+        while self.count and self.first_date < date:
+            self.pop_left()
+
+    def last(self, field):
+        return self._buf[field][self._pos(self.count - 1)]
+
+    def mean(self, field, window):
+        """Mean of the last `window` values, NaN if fewer bars or any is missing (as rolling().mean())."""
+        key = (field, window)
+        if self.count < window or self._nans[key]:
+            return float('nan')
+        return self._sums[key] / window
+
+    def columns(self, last=None):
+        """The bars (or only the `last` newest) as a dict of column lists, oldest first."""
+        first = 0 if last is None else self.count - last
+        positions = [self._pos(i) for i in range(first, self.count)]
+        data = {'date': [self._dates[p] for p in positions]}
+        for f in self.fields:
+            data[f] = [self._buf[f][p] for p in positions]
+        return data
+
+    def frame(self):
+        """The bars as a DataFrame, oldest first (same shape as get_daily_bars)."""
+        return pd.DataFrame(self.columns())
+
+    def restore(self, dates, columns, sums, nans):
+        """Set the bars (oldest first) and running sums saved by RollingStateStore, without replaying them."""
+        n = len(dates)
+        self._dates[:n] = dates
+        for f in self.fields:
+            self._buf[f][:n] = columns[f]
+        self._start, self.count = 0, n
+        self._sums.update(sums)
+        self._nans.update(nans)
+
+
+class RollingStateStore:
+    """
+    RollingState for every stock of a universe, persisted under one directory.
+
+    Each save() appends only the bars pushed since the previous save as a new
+    generation file, and rewrites a small table holding every state's bar range,
+    running sums and NaN counts, so load() restores the ring buffers directly
+    instead of replaying the bars. The directory is specific to the fields, size
+    and windows, so a different strategy mix starts from a fresh store.
+    """
+    # Generations kept before save() compacts the bars into a single file
+    MAX_GENERATIONS = 20
+
+    def __init__(self, fields, size, windows, root=None):
+        self.fields = [f for f in fields if f != 'date']
+        self.size = size
+        self.windows = sorted(set(windows))
+        spec = repr((self.fields, size, self.windows)).encode('utf-8')
+        root = root or get_cache_dir('rolling_state')
+        self.path = os.path.join(root, hashlib.sha1(spec).hexdigest()[:16])
+        self.states = {}
+
+    def new_state(self):
+        return RollingState(self.fields, self.size, self.windows)
+
+    def _bars_path(self, gen):
+        return os.path.join(self.path, f"bars-{gen:06d}.parquet")
+
+    def _states_path(self):
+        return os.path.join(self.path, 'states.parquet')
+
+    def _generations(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(int(name[5:-8]) for name in os.listdir(self.path)
+                      if name.startswith('bars-') and name.endswith('.parquet'))
+
+    @staticmethod
+    def _sum_column(key):
+        return f"sum:{key[0]}:{key[1]}"
+
+    @staticmethod
+    def _nan_column(key):
+        return f"nan:{key[0]}:{key[1]}"
+
+    def load(self):
+        if not os.path.exists(self._states_path()):
+            return self
+        meta = pd.read_parquet(self._states_path())
+        if meta.empty:
+            return self
+        saved = int(meta['gen'].iloc[0])
+        first = int(meta['base'].min())
+        frames = []
+        for gen in self._generations():
+            if gen > saved:
+                # Written by an interrupted save that never recorded its states
+                os.remove(self._bars_path(gen))
+            elif gen >= first:
+                frames.append(pd.read_parquet(self._bars_path(gen)).assign(gen=gen))
+        if not frames:
+            return self
+        bars = pd.concat(frames, ignore_index=True).merge(meta[['code', 'base', 'first_date', 'last_date']], on='code')
+        bars = bars[(bars['gen'] >= bars['base']) & (bars['date'] >= bars['first_date'])
+                    & (bars['date'] <= bars['last_date'])]
+        # A bar written again in a later generation (a replaced intraday bar) wins
+        bars = bars.sort_values(['code', 'date', 'gen'], kind='stable').drop_duplicates(['code', 'date'], keep='last')
+
+        # One list per column for the whole store, sliced per code
+        codes = bars['code'].to_numpy()
+        bounds = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        starts = np.concatenate(([0], bounds))[:len(codes)]
+        ends = np.concatenate((bounds, [len(codes)]))[:len(codes)]
+        spans = {code: (lo, hi) for code, lo, hi in zip(codes[starts].tolist(), starts.tolist(), ends.tolist())}
+        dates = bars['date'].tolist()
+        columns = {f: bars[f].tolist() for f in self.fields if f != 'code'}
+
+        for rec in meta.to_dict('records'):
+            code = rec['code']
+            lo, hi = spans.get(code, (0, 0))
+            if hi - lo != rec['count']:
+                # Bars missing on disk: leave the stock to a full rebuild
+                continue
+            state = self.new_state()
+            bars_of = {f: col[lo:hi] for f, col in columns.items()}
+            if 'code' in self.fields:
+                bars_of['code'] = [code] * (hi - lo)
+            state.restore(dates[lo:hi], bars_of,
+                          {key: rec[self._sum_column(key)] for key in self.windows},
+                          {key: int(rec[self._nan_column(key)]) for key in self.windows})
+            state.base = int(rec['base'])
+            self.states[code] = state
+        return self
+
+    def push(self, code, bar):
+        """Append a bar (dict with 'date' and the fields) to a stock's state, creating it if needed."""
+        state = self.states.get(code)
+        if state is None:
+            state = self.states[code] = self.new_state()
+        if state.last_date is None or bar['date'] > state.last_date:
+            state.push(bar['date'], bar)
+
+    def save(self):
+        """Write the bars pushed since the last save, and the state table."""
+        states = {code: state for code, state in self.states.items() if len(state)}
+        if not states:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        generations = self._generations()
+        gen = (generations[-1] if generations else 0) + 1
+        compact = len(generations) >= self.MAX_GENERATIONS
+
+        columns = {'code': [], 'date': [], **{f: [] for f in self.fields if f != 'code'}}
+        meta = {'code': [], 'base': [], 'first_date': [], 'last_date': [], 'count': [],
+                **{self._sum_column(key): [] for key in self.windows},
+                **{self._nan_column(key): [] for key in self.windows}}
+        for code, state in states.items():
+            # New or rebuilt states, and states whose saved last bar was dropped, are written whole
+            if compact or state.base is None or state._dropped:
+                state.base, state.unsaved = gen, len(state)
+            if state.unsaved:
+                bars = state.columns(state.unsaved)
+                columns['code'].extend([code] * state.unsaved)
+                for f in columns:
+                    if f != 'code':
+                        columns[f].extend(bars[f])
+            meta['code'].append(code)
+            meta['base'].append(state.base)
+            meta['first_date'].append(state.first_date)
+            meta['last_date'].append(state.last_date)
+            meta['count'].append(len(state))
+            for key in self.windows:
+                meta[self._sum_column(key)].append(state._sums[key])
+                meta[self._nan_column(key)].append(state._nans[key])
+
+        if columns['code']:
+            tmp_path = f"{self._bars_path(gen)}.{os.getpid()}.tmp"
+            pd.DataFrame(columns).to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self._bars_path(gen))
+        else:
+            gen -= 1
+        tmp_path = f"{self._states_path()}.{os.getpid()}.tmp"
+        pd.DataFrame(meta).assign(gen=gen).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self._states_path())
+
+        for state in states.values():
+            state.unsaved = 0
+            state._dropped.clear()
+        if compact:
+            for old in generations:
+                os.remove(self._bars_path(old))
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from core import engine as engine_module
+from core.data_provider import data_provider
+from core.trading_calendar import TradingCalendar
+from strategies import get_strategy
+
+TRADE_DATES = [d.strftime('%Y-%m-%d') for d in pd.bdate_range('2024-01-01', periods=80)]
+
+
+@pytest.fixture
+def bars(monkeypatch):
+    """Provider stub over a rising series; 'sh.2' was suspended once in its last 20 sessions."""
+    suspended = {'sh.2': {TRADE_DATES[-5]}}
+
+    def get_daily_bars(code, end_date, lookback_days=60, lookback_bars=None, fields=None):
+        dates = TRADE_DATES[-lookback_bars:] if lookback_bars else TRADE_DATES
+        dates = [d for d in dates if d not in suspended.get(code, ())]
+        return pd.DataFrame({'date': dates, 'code': code, 'close': [10.0 + TRADE_DATES.index(d) for d in dates]})
+
+    monkeypatch.setattr(data_provider, 'get_daily_bars', get_daily_bars)
+    monkeypatch.setattr(data_provider, '_get_pool', lambda *args: None)
+    monkeypatch.setattr(data_provider, 'workers', 1)
+
+
+def test_lookback_has_margin_over_warmup():
+    _, lookback_bars = engine_module.AnalysisEngine._data_requirements([get_strategy('ma')])
+    assert lookback_bars >= 2 * get_strategy('ma').min_bars
+    assert lookback_bars >= engine_module.MIN_LOOKBACK_BARS
+
+
+def test_suspended_stock_still_has_warmup(bars):
+    engine = engine_module.AnalysisEngine([get_strategy('ma')])
+    results = engine.run(['sh.1', 'sh.2'], TRADE_DATES[-1])
+    assert [r['code'] for r in results] == ['sh.1', 'sh.2']
+
+
+@pytest.fixture
+def random_bars(monkeypatch, tmp_path):
+    """Provider stub over random bars with suspensions, cut to the trading calendar like baostock."""
+    rng = np.random.default_rng(0)
+    codes = [f'sh.{i}' for i in range(12)]
+    frames = {}
+    for i, code in enumerate(codes):
+        n = len(TRADE_DATES)
+        frames[code] = pd.DataFrame({
+            'date': TRADE_DATES, 'code': code,
+            'close': 10 * np.exp(rng.standard_normal(n).cumsum() * 0.03),
+            'volume': rng.lognormal(10, 0.5, n), 'pctChg': rng.normal(0, 3, n),
+            'turn': rng.uniform(0, 10, n), 'isST': np.where(rng.random(n) < 0.2, '1', '0'),
+            'peTTM': rng.uniform(-10, 60, n), 'pbMRQ': rng.uniform(0, 5, n),
+        })[rng.random(n) > 0.05 * (i % 3)].reset_index(drop=True)
+
+    calendar = pd.DataFrame({'calendar_date': TRADE_DATES, 'is_trading_day': '1'})
+    monkeypatch.setattr(data_provider, 'calendar',
+                        TradingCalendar(lambda *args: calendar, str(tmp_path / 'calendar.parquet'), auto_refresh=False))
+
+    def get_daily_bars(code, end_date, lookback_days=60, lookback_bars=None, fields=None):
+        start = data_provider.calendar.offset(end_date, -(lookback_bars - 1))
+        df = frames[code]
+        return df[(df['date'] >= start) & (df['date'] <= end_date)].reset_index(drop=True)
+
+    monkeypatch.setattr(data_provider, 'get_daily_bars', get_daily_bars)
+    monkeypatch.setattr(data_provider, '_get_pool', lambda *args: None)
+    return codes
+
+
+def test_range_scan_matches_single_date_scans(random_bars):
+    engine = engine_module.AnalysisEngine([get_strategy(key) for key in ('ma', 'vol', 'turn', 'pe')])
+    dates = TRADE_DATES[-15:]
+    expected = [r for date in dates for r in engine.scan_chunk(random_bars, date)[0]]
+    results, _ = engine.scan_range_chunk(random_bars, dates)
+    assert len(expected) > 0
+    assert pd.DataFrame(results).equals(pd.DataFrame(expected))
@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+from core.indicators import IndicatorCache
+
+
+def _bars(last_close):
+    return pd.DataFrame({'date': ['2024-01-02', '2024-01-03', '2024-01-04'], 'code': 'sh.1',
+                         'close': [10.0, 11.0, last_close], 'volume': [1.0, 2.0, np.nan]})
+
+
+def test_refreshed_last_bar_gets_fresh_indicators():
+    cache = IndicatorCache()
+    assert cache.get('sh.1', _bars(12.0)) is cache.get('sh.1', _bars(12.0))
+    assert cache.get('sh.1', _bars(12.0)).ma('close', 3).iloc[-1] == 11.0
+    # Same dates, intraday update of the last close
+    assert cache.get('sh.1', _bars(15.0)).ma('close', 3).iloc[-1] == 12.0
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+from core.data_provider import data_provider
+from core.fundamental_snapshot import FundamentalSnapshot
+from core.pit_fundamentals import PointInTimeIndex
+
+PERIOD = ('2024', '1')
+DATE = '2024-05-06'
+
+
+def _report(code, stat_date='2024-03-31', pub_date='2024-04-20', yoy=0.1):
+    return pd.DataFrame({'code': [code], 'pubDate': [pub_date], 'statDate': [stat_date], 'YOYNI': [yoy]})
+
+
+@pytest.fixture
+def provider(monkeypatch, tmp_path):
+    """Provider stub: answers[code] is a frame, an empty frame ("not published") or None (failed)."""
+    monkeypatch.setenv('OMNIALPHA_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(data_provider, 'fundamental_cache', None)
+    monkeypatch.setattr(FundamentalSnapshot, '_loaded', {})
+    monkeypatch.setattr(PointInTimeIndex, '_indexes', {})
+    answers, queried = {}, []
+
+    def call_many(method, args_list, workers=None):
+        queried.extend(code for code, _, _ in args_list)
+        return [answers[code] for code, _, _ in args_list]
+
+    monkeypatch.setattr(data_provider, 'call_many', call_many)
+    return answers, queried
+
+
+def test_unpublished_code_is_rechecked_after_ttl(provider):
+    answers, queried = provider
+    answers.update({'sh.1': _report('sh.1'), 'sh.2': _report('sh.2').iloc[:0]})
+    index = PointInTimeIndex.load('growth', ['sh.1', 'sh.2'], [PERIOD])
+    assert index.as_of('sh.2', DATE) is None
+
+    # Within the TTL the "not published" answer is trusted
+    queried.clear()
+    PointInTimeIndex.load('growth', ['sh.1', 'sh.2'], [PERIOD])
+    assert queried == []
+
+    # Once it expires the code is queried again and its new report indexed
+    snapshot = FundamentalSnapshot.active(*PERIOD)
+    snapshot.unpublished['growth']['sh.2'] -= FundamentalSnapshot._missing_ttl() + 1
+    answers['sh.2'] = _report('sh.2', pub_date='2024-04-29')
+    PointInTimeIndex.load('growth', ['sh.1', 'sh.2'], [PERIOD])
+    assert queried == ['sh.2']
+    assert index.as_of('sh.2', DATE)['pubDate'] == '2024-04-29'
+
+
+def test_as_of_keeps_latest_period_published_out_of_order(provider):
+    answers, _ = provider
+    # 2023 annual report published after 2024Q1
+    answers['sh.1'] = _report('sh.1', '2023-12-31', '2024-04-28', yoy=0.4)
+    PointInTimeIndex.load('growth', ['sh.1'], [('2023', '4')])
+    answers['sh.1'] = _report('sh.1', '2024-03-31', '2024-04-20', yoy=0.1)
+    index = PointInTimeIndex.load('growth', ['sh.1'], [PERIOD])
+
+    assert index.as_of('sh.1', '2024-04-19') is None
+    assert index.as_of('sh.1', '2024-04-20')['statDate'] == '2024-03-31'
+    assert index.as_of('sh.1', DATE)['statDate'] == '2024-03-31'
+
+
+def test_failed_code_is_retried(provider):
+    answers, queried = provider
+    answers.update({'sh.1': _report('sh.1'), 'sh.2': None})
+    index = PointInTimeIndex.load('growth', ['sh.1', 'sh.2'], [PERIOD])
+    snapshot = FundamentalSnapshot.active(*PERIOD)
+    assert snapshot.has('growth', 'sh.1') and not snapshot.has('growth', 'sh.2')
+    assert index.as_of('sh.2', DATE) is None
+
+    queried.clear()
+    answers['sh.2'] = _report('sh.2', yoy=0.3)
+    PointInTimeIndex.load('growth', ['sh.1', 'sh.2'], [PERIOD])
+    assert queried == ['sh.2']
+    assert index.as_of('sh.2', DATE)['YOYNI'] == 0.3
@@ -0,0 +1,84 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from core.rolling_state import RollingStateStore
+
+DATES = [d.strftime('%Y-%m-%d') for d in pd.bdate_range('2024-01-01', periods=40)]
+FIELDS = ['date', 'code', 'close', 'volume', 'isST']
+WINDOWS = [('close', 5), ('close', 20), ('volume', 5)]
+SIZE = 25
+
+
+def _bar(rng, code, date):
+    close = float(rng.normal(10, 1))
+    return {'date': date, 'code': code, 'close': math.nan if rng.random() < 0.1 else close,
+            'volume': float(rng.lognormal(10, 0.5)), 'isST': '1' if rng.random() < 0.1 else '0'}
+
+
+def _store(tmp_path):
+    return RollingStateStore(FIELDS, SIZE, WINDOWS, root=str(tmp_path))
+
+
+def _assert_same(loaded, expected):
+    assert loaded.states.keys() == expected.states.keys()
+    for code, state in expected.states.items():
+        other = loaded.states[code]
+        pd.testing.assert_frame_equal(other.frame(), state.frame())
+        assert other._sums == state._sums and other._nans == state._nans
+        for field, window in WINDOWS:
+            np.testing.assert_equal(other.mean(field, window), state.mean(field, window))
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+def test_save_load_restores_states(tmp_path, rng):
+    store = _store(tmp_path)
+    for date in DATES[:30]:
+        for code in ('sh.1', 'sh.2', 'sz.3'):
+            store.push(code, _bar(rng, code, date))
+    store.save()
+    _assert_same(_store(tmp_path).load(), store)
+
+    # Bars leaving the lookback window are dropped on load too
+    store.states['sz.3'].drop_before(DATES[20])
+    store.save()
+    _assert_same(_store(tmp_path).load(), store)
+
+
+def test_save_writes_only_new_bars(tmp_path, rng):
+    store = _store(tmp_path)
+    for date in DATES[:30]:
+        for code in ('sh.1', 'sh.2'):
+            store.push(code, _bar(rng, code, date))
+    store.save()
+
+    # Next day: one new bar per stock, then an intraday rerun replaces it
+    for code in ('sh.1', 'sh.2'):
+        store.push(code, _bar(rng, code, DATES[30]))
+    store.save()
+    assert len(pd.read_parquet(store._bars_path(2))) == 2
+    store.states['sh.1'].pop_right()
+    store.push('sh.1', _bar(rng, 'sh.1', DATES[30]))
+    store.save()
+    assert len(pd.read_parquet(store._bars_path(3))) == 1
+    _assert_same(_store(tmp_path).load(), store)
+
+    # A saved bar dropped and not pushed again forces a full rewrite of that stock
+    store.states['sh.2'].pop_right()
+    store.push('sh.2', _bar(rng, 'sh.2', DATES[31]))
+    store.save()
+    assert len(pd.read_parquet(store._bars_path(4))) == SIZE
+    _assert_same(_store(tmp_path).load(), store)
+
+
+def test_generations_are_compacted(tmp_path, rng):
+    store = _store(tmp_path)
+    for date in DATES:
+        store.push('sh.1', _bar(rng, 'sh.1', date))
+        store.save()
+    assert len(store._generations()) <= RollingStateStore.MAX_GENERATIONS
+    _assert_same(_store(tmp_path).load(), store)
@@ -0,0 +1,111 @@
+import os
+import datetime
+import numpy as np
+import pandas as pd
+from utils.file_io import get_cache_dir
+
+
+class TradingCalendar:
+    """
+    A-share trading calendar, loaded once from baostock and persisted locally.
+
+    Every calendar date is mapped to the position of the last trading day on or
+    before it, so prev/next/offset are O(1) dictionary lookups.
+    """
+    START_DATE = '2005-01-01'
+
+    def __init__(self, loader, path=None, auto_refresh=True):
+        """
+        :param loader: callable(start_date, end_date) -> DataFrame with
+                       'calendar_date' and 'is_trading_day' columns, or None on failure
+        :param auto_refresh: reload from baostock when the stored calendar does not cover today
+        """
+        self.loader = loader
+        self.path = path or os.path.join(get_cache_dir('calendar'), 'trade_dates.parquet')
+        self.auto_refresh = auto_refresh
+        self._days = None       # sorted np.array of trading dates ('YYYY-MM-DD')
+        self._pos = None        # calendar date -> index of last trading day <= date
+        self._trading = None    # calendar date -> bool
+        self._end = None        # last calendar date covered
+
+    def _build(self, df):
+        dates = df['calendar_date'].astype(str).tolist()
+        flags = (df['is_trading_day'].astype(str) == '1').tolist()
+        self._days = np.array([d for d, f in zip(dates, flags) if f])
+        positions = np.cumsum(flags) - 1
+        self._pos = dict(zip(dates, positions.tolist()))
+        self._trading = dict(zip(dates, flags))
+        self._end = dates[-1]
+
+    def load(self, force=False):
+        """Load the calendar from disk, refreshing from baostock when it does not cover today."""
+        today = datetime.datetime.now().strftime("%Y-%m-%d")
+        if not force and self._end is not None and (self._end >= today or not self.auto_refresh):
+            return self
+
+        df = None
+        if not force and os.path.exists(self.path):
+            df = pd.read_parquet(self.path)
+            if df.empty or (self.auto_refresh and str(df['calendar_date'].iloc[-1]) < today):
+                df = None
+
+        if df is None:
+            # Fetch through the end of the year; the exchange publishes the calendar in advance
+            end_date = f"{datetime.datetime.now().year}-12-31"
+            df = self.loader(self.START_DATE, end_date)
+            if df is None or df.empty:
+                raise RuntimeError("Failed to load trading calendar from baostock")
+            df = df[['calendar_date', 'is_trading_day']].astype(str).sort_values('calendar_date')
+            # Write atomically; pool workers may refresh the calendar concurrently
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self.path)
+
+        self._build(df.reset_index(drop=True))
+        return self
+
+    def _position(self, date_str):
+        self.load()
+        if date_str not in self._pos:
+            raise ValueError(f"Date {date_str} is outside the trading calendar")
+        return self._pos[date_str]
+
+    def _day_at(self, pos):
+        if pos < 0 or pos >= len(self._days):
+            raise ValueError("Trading day offset is outside the trading calendar")
+        return str(self._days[pos])
+
+    def is_trading_day(self, date_str):
+        self.load()
+        return self._trading.get(date_str, False)
+
+    def latest(self, date_str=None):
+        """Last trading day on or before date_str (defaults to today)."""
+        date_str = date_str or datetime.datetime.now().strftime("%Y-%m-%d")
+        return self._day_at(self._position(date_str))
+
+    def prev(self, date_str):
+        """Last trading day strictly before date_str."""
+        pos = self._position(date_str)
+        if self._trading[date_str]:
+            pos -= 1
+        return self._day_at(pos)
+
+    def next(self, date_str):
+        """First trading day strictly after date_str."""
+        return self._day_at(self._position(date_str) + 1)
+
+    def offset(self, date_str, n):
+        """
+        Move n trading days from date_str (negative n goes back in time).
+        A non-trading date is first anchored to the previous trading day.
+        """
+        return self._day_at(self._position(date_str) + n)
+
+    def slice(self, start_date, end_date):
+        """All trading days in [start_date, end_date] as a numpy array."""
+        self.load()
+        lo = np.searchsorted(self._days, start_date, side='left')
+        hi = np.searchsorted(self._days, end_date, side='right')
+        return self._days[lo:hi]
@@ -1,9 +1,13 @@
 import argparse
+import os
 import sys
 from core.data_provider import data_provider
 from core.engine import AnalysisEngine
+from core.checkpoint import ScanCheckpoint
+from core.result_cache import ResultCache
+from core.profiler import profiler
 from strategies import get_strategy, get_all_strategy_keys
-from utils.file_io import load_stock_pool_from_csv, save_results_to_csv
+from utils.file_io import load_stock_pool_from_csv, ResultWriter
 from utils.date_utils import get_today_str
 
 def main():
@@ -12,6 +16,10 @@ def main():
     # Date argument
     parser.add_argument('--date', type=str, 
                         help='Target date YYYY-MM-DD. Defaults to the latest trading day.')
+    parser.add_argument('--start', type=str,
+                        help='With --end: scan every trading day in [start, end] and output the selection history.')
+    parser.add_argument('--end', type=str,
+                        help='Last date of a --start/--end range scan (YYYY-MM-DD).')
     
     # Strategy selection
     available_keys = get_all_strategy_keys()
@@ -25,14 +33,71 @@ def main():
     group.add_argument('--quick', action='store_true', 
                        help='Quick mode: Scan only the first 20 stocks of HS300 for testing.')
     
+    # Offline fixtures (equivalent to the OMNIALPHA_RECORD / OMNIALPHA_REPLAY env vars)
+    fixture_group = parser.add_mutually_exclusive_group()
+    fixture_group.add_argument('--record', type=str, metavar='DIR',
+                               help='Record every baostock response to DIR for later offline replay.')
+    fixture_group.add_argument('--replay', type=str, metavar='DIR',
+                               help='Serve baostock responses recorded in DIR, without network access.')
+    
+    # Incremental daily re-screen
+    parser.add_argument('--incremental', action='store_true',
+                        help='Advance persisted per-stock rolling state by the new bars instead of rescanning full lookbacks.')
+    
+    # Parallel scanning
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of parallel workers for the scan (default: serial check, pooled fetching).')
+    parser.add_argument('--executor', choices=['process', 'thread'], default='process',
+                        help='Worker type for --workers: process (one baostock session each) or thread.')
+    
+    # Output
+    parser.add_argument('--output', type=str, default=None,
+                        help='Result file (.csv or .parquet), written while the scan runs. '
+                             'Defaults to selection_<date>_<strategies>.csv')
+    
+    # Checkpoint / resume
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume an interrupted scan with the same stock pool, strategies and date.')
+    parser.add_argument('--checkpoint-interval', type=float, default=30,
+                        help='Seconds between progress checkpoints (default: 30).')
+    
+    # Result cache
+    parser.add_argument('--no-result-cache', action='store_true',
+                        help='Recompute every strategy check instead of reusing results from earlier runs.')
+    
+    # Profiling
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='JSON_PATH',
+                        help='Print fetch/parse/check timings, pass rates and cache hits after the scan, '
+                             'and also save them as JSON when a path is given.')
+    
     args = parser.parse_args()
+    range_mode = bool(args.start or args.end)
+    if range_mode and not (args.start and args.end):
+        parser.error("--start and --end must be given together")
+    if range_mode and args.date:
+        parser.error("--date cannot be combined with --start/--end")
+    if range_mode and args.incremental:
+        parser.error("--incremental cannot be combined with --start/--end")
+    
+    # Also exported so worker processes started without fork pick the fixtures up
+    if args.replay:
+        os.environ['OMNIALPHA_REPLAY'] = args.replay
+        data_provider.use_fixtures(replay_dir=args.replay)
+    elif args.record:
+        os.environ['OMNIALPHA_RECORD'] = args.record
+        data_provider.use_fixtures(record_dir=args.record)
+    
+    if args.profile is not None:
+        profiler.enable()
     
     # 1. Initialize Data Provider (Login)
+    engine = None
     try:
         data_provider.login()
         
         # 2. Determine Date
-        target_date = args.date
+        # (range scans take the stock pool as of the end date)
+        target_date = args.end if range_mode else args.date
         if not target_date:
             target_date = data_provider.get_latest_trading_date()
             print(f"Auto-detected latest trading date: {target_date}")
@@ -73,18 +138,61 @@ def main():
             
         print(f"Active Strategies: {[s.name for s in active_strategies]}")
             
-        # 5. Run Analysis
-        engine = AnalysisEngine(active_strategies)
-        results = engine.run(stock_pool, target_date)
+        # 5. Run Analysis, saving results as they come so an interrupted scan keeps its partial output
+        date_label = f"{args.start}_{args.end}" if range_mode else target_date
+        filename = args.output or f"selection_{date_label}_{'_'.join([k.strip() for k in selected_keys])}.csv"
+        writer = ResultWriter(filename)
+        # Cached check results are reused unless disabled (or running on fixtures, where every query should run)
+        use_result_cache = not (args.no_result_cache or args.record or args.replay)
+        engine = AnalysisEngine(active_strategies, result_cache=ResultCache() if use_result_cache else None)
+        
+        if range_mode or args.incremental:
+            try:
+                if range_mode:
+                    # Selection history: one row per (date, code, strategy)
+                    writer.write(engine.run_range(stock_pool, args.start, args.end,
+                                                  workers=args.workers, executor=args.executor))
+                else:
+                    writer.write(engine.run_incremental(stock_pool, target_date, workers=args.workers))
+            finally:
+                writer.close()
+            if writer.rows_written:
+                print(f"\n{writer.rows_written} results saved to: {filename}")
+            else:
+                print("No stocks matched the selected strategies.")
+            return
+        
+        checkpoint = ScanCheckpoint(stock_pool, active_strategies, target_date, interval=args.checkpoint_interval)
+        if args.resume and not checkpoint.load():
+            print("No matching checkpoint found, starting from the beginning.")
+        try:
+            for res in engine.iter_run(stock_pool, target_date, workers=args.workers, executor=args.executor,
+                                       checkpoint=checkpoint):
+                print(f"  Match: {res['code']} [{res['strategy']}]")
+                writer.write([res])
+        except BaseException:
+            # Session drop, Ctrl-C, ...: keep what has been scanned so far
+            if checkpoint.processed:
+                checkpoint.save()
+                print("\nScan interrupted. Progress saved; rerun with --resume to continue.")
+            raise
+        finally:
+            writer.close()
         
-        # 6. Save Results
-        if results:
-            filename = f"selection_{target_date}_{'_'.join([k.strip() for k in selected_keys])}.csv"
-            save_results_to_csv(results, filename)
+        if writer.rows_written:
+            print(f"\n{writer.rows_written} results saved to: {filename}")
         else:
             print("No stocks matched the selected strategies.")
             
     finally:
+        if args.profile is not None:
+            # Also reported for interrupted scans
+            strategies = engine.summary() if engine is not None else None
+            print()
+            profiler.print_report(strategies)
+            if args.profile:
+                profiler.save_json(args.profile, strategies)
+                print(f"Profile saved to: {args.profile}")
         data_provider.logout()
 
 if __name__ == "__main__":
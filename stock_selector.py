@@ -6,6 +6,7 @@ import sys
 
 # 引入我们定义的模块
 from strategy_interface import StockStrategy
+from core.data_provider import data_provider
 from strategies import MovingAverageStrategy, VolumeRiseStrategy, LowPeStrategy, HighTurnoverStrategy
 
 # 注册可用策略
@@ -17,16 +18,8 @@ AVAILABLE_STRATEGIES = {
 }
 
 def get_latest_trading_date():
-    today = datetime.datetime.now().strftime("%Y-%m-%d")
-    start_lookback = (datetime.datetime.now() - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
-    rs = bs.query_trade_dates(start_date=start_lookback, end_date=today)
-    data_list = []
-    while (rs.error_code == '0') & rs.next():
-        data_list.append(rs.get_row_data())
-    if not data_list: return today
-    df = pd.DataFrame(data_list, columns=rs.fields)
-    trading_days = df[df['is_trading_day'] == '1']['calendar_date'].tolist()
-    return trading_days[-1] if trading_days else today
+    # 交易日历只从服务器拉取一次，之后从本地缓存读取
+    return data_provider.get_latest_trading_date()
 
 def get_stock_pool(date, limit=None):
     print(f"正在获取 {date} 的沪深300成分股...")
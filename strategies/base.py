@@ -1,9 +1,26 @@
+import hashlib
 from abc import ABC, abstractmethod
 
 class StockStrategy(ABC):
     """
     Abstract base class for all stock selection strategies.
     """
+
+    # Daily bar fields the strategy reads, and the minimum number of bars it needs.
+    # The engine fetches only the union of these across the active strategies.
+    required_fields = ('date', 'close')
+    min_bars = 1
+
+    # Expected seconds per check() call. Only a hint: the engine orders strategies
+    # by this until it has measured the real cost.
+    cost = 0.001
+
+    # (field, window) moving averages the strategy reads, maintained incrementally
+    # by the engine's rolling state (see check_state)
+    rolling_windows = ()
+
+    # Bump when check() changes behaviour so results cached by older versions are not reused
+    version = 1
     
     @property
     @abstractmethod
@@ -18,12 +35,63 @@ class StockStrategy(ABC):
         pass
 
     @abstractmethod
-    def check(self, code, data_df):
+    def check(self, code, data_df, indicators=None):
         """
         Check if a stock meets the strategy criteria.
         
         :param code: Stock code
         :param data_df: Historical data DataFrame (including date, close, volume, etc.)
+        :param indicators: Optional core.indicators.StockIndicators for data_df, shared by all
+                           strategies so each indicator is computed once per stock
         :return: (bool, dict) -> (Is Selected, Details/Reason)
         """
         pass
+
+    def screen(self, panel):
+        """
+        Optional vectorized version of check() over a whole universe at once.
+        
+        :param panel: dict of field -> DataFrame (index: date, columns: code)
+        :return: (mask, details) -> boolean Series and details DataFrame indexed by code,
+                 evaluated on the last row; None if only check() is supported
+        """
+        return None
+
+    def screen_range(self, panel):
+        """
+        Optional version of screen() evaluated on every row of the panel at once, with
+        rolling ops, so a multi-date scan screens its whole window in one pass.
+        
+        :return: (mask, details) -> boolean DataFrame (index: date, columns: code) and
+                 dict of detail name -> DataFrame of the same shape; None if unsupported
+        """
+        return None
+
+    def check_state(self, code, state):
+        """
+        Optional version of check() reading a core.rolling_state.RollingState, whose
+        last() values and mean() over rolling_windows are O(1).
+        
+        :return: (bool, dict) like check(); None if only check() is supported
+        """
+        return None
+
+    def cache_key(self):
+        """Identifies the strategy and its parameters in the result cache."""
+        params = sorted((k, repr(v)) for k, v in vars(self).items())
+        spec = (type(self).__module__, type(self).__qualname__, self.version,
+                self.required_fields, self.min_bars, params)
+        return f"{self.name}_{hashlib.sha1(repr(spec).encode('utf-8')).hexdigest()[:12]}"
+
+    def data_fingerprint(self, code, data_df):
+        """
+        Fingerprint of inputs check() reads besides the last min_bars bars of required_fields
+        (e.g. a quarterly report). None means the result must not be cached.
+        """
+        return ''
+
+    def prepare(self, stock_pool, date):
+        """
+        Optional hook called once before a scan, e.g. to preload data for the whole pool.
+        """
+        pass
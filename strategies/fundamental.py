@@ -1,6 +1,9 @@
 from .base import StockStrategy
 from core.data_provider import data_provider
+from core.fundamental_snapshot import FundamentalSnapshot, TABLES
+from core.pit_fundamentals import PointInTimeIndex, candidate_periods, period_of
 import datetime
+import pandas as pd
 
 def _get_report_period(date_str):
     """
@@ -24,7 +27,62 @@ def _get_report_period(date_str):
     else:
         return str(year), "3"
 
+def _get_quarterly_row(table, code, year, quarter):
+    """
+    Report row for one stock as a Series (None if not published).
+    Uses the preloaded universe snapshot when available, otherwise queries the provider.
+    """
+    snapshot = FundamentalSnapshot.active(year, quarter)
+    if snapshot is not None and snapshot.has(table, code):
+        return snapshot.row(table, code)
+
+    df = getattr(data_provider, TABLES[table])(code, year, quarter)
+    if df is None or df.empty:
+        return None
+    return df.iloc[0]
+
+def _get_report_row(table, code, date_str):
+    """
+    Latest report known as of date_str: (row, year, quarter), row is None if unavailable.
+    Uses the point-in-time index (by publication date) when it covers the stock,
+    otherwise guesses the period from the calendar month and queries it.
+    """
+    index = PointInTimeIndex.get(table)
+    if index is not None and index.covers(code, date_str):
+        row = index.as_of(code, date_str)
+        if row is None:
+            return None, None, None
+        year, quarter = period_of(row['statDate'])
+        return row, year, quarter
+
+    year, quarter = _get_report_period(date_str)
+    return _get_quarterly_row(table, code, year, quarter), year, quarter
+
+class QuarterlyReportStrategy(StockStrategy):
+    """
+    Base for strategies reading one quarterly report table.
+    The table is preloaded for the whole stock pool before a scan.
+    """
+    table = None
+    cost = 0.05  # may hit the network when the report is not preloaded
+
+    def prepare(self, stock_pool, date):
+        # One extra quarter so bars ending in the previous quarter are covered too
+        PointInTimeIndex.load(self.table, stock_pool, candidate_periods(date, count=4))
+
+    def data_fingerprint(self, code, df):
+        # The report check() reads is part of its input; only indexed reports can be identified
+        date_str = str(df.iloc[-1]['date'])
+        index = PointInTimeIndex.get(self.table)
+        if index is None or not index.covers(code, date_str):
+            return None
+        row = index.as_of(code, date_str)
+        return '' if row is None else f"{row['statDate']}@{row['pubDate']}"
+
 class LowPeStrategy(StockStrategy):
+    required_fields = ('date', 'close', 'peTTM', 'pbMRQ')
+    min_bars = 1
+
     @property
     def name(self):
         return "Value_LowPE"
@@ -33,7 +91,7 @@ class LowPeStrategy(StockStrategy):
     def description(self):
         return "Low Valuation: 0 < PE_TTM < 30"
         
-    def check(self, code, df):
+    def check(self, code, df, indicators=None):
         if df is None or len(df) < 1:
             return False, {}
             
@@ -53,7 +111,32 @@ class LowPeStrategy(StockStrategy):
             }
         return False, {}
 
-class HighGrowthStrategy(StockStrategy):
+    def check_state(self, code, state):
+        if len(state) < 1:
+            return False, {}
+        pe = state.last('peTTM')
+        if 0 < pe < 30:
+            return True, {'price': state.last('close'), 'peTTM': round(pe, 2), 'pbMRQ': round(state.last('pbMRQ'), 2)}
+        return False, {}
+
+    def screen(self, panel):
+        pe = panel['peTTM'].iloc[-1]
+        mask = (pe > 0) & (pe < 30)
+        details = pd.DataFrame({
+            'price': panel['close'].iloc[-1],
+            'peTTM': pe.round(2),
+            'pbMRQ': panel['pbMRQ'].iloc[-1].round(2)
+        })
+        return mask, details
+
+    def screen_range(self, panel):
+        pe = panel['peTTM']
+        mask = (pe > 0) & (pe < 30)
+        return mask, {'price': panel['close'], 'peTTM': pe.round(2), 'pbMRQ': panel['pbMRQ'].round(2)}
+
+class HighGrowthStrategy(QuarterlyReportStrategy):
+    table = 'growth'
+
     @property
     def name(self):
         return "Growth_DoubleHigh"
@@ -62,23 +145,22 @@ class HighGrowthStrategy(StockStrategy):
     def description(self):
         return "High Growth: YOY Profit > 20% AND YOY Revenue > 20%"
         
-    def check(self, code, df):
+    def check(self, code, df, indicators=None):
         # Need date from df to decide which quarter to check
         if df is None or len(df) < 1:
             return False, {}
             
         date_str = str(df.iloc[-1]['date'])
-        year, quarter = _get_report_period(date_str)
         
-        # Query Growth Data
-        g_df = data_provider.get_growth_data(code, year, quarter)
-        if g_df is None or g_df.empty:
+        # Query Growth Data (latest report published as of the bar date)
+        g_row, year, quarter = _get_report_row(self.table, code, date_str)
+        if g_row is None:
             return False, {}
             
         try:
             # YOYNI: Net Income YOY, YOYAsset: Asset YOY (Approximation for scale growth, sometimes YOYRevenue is not directly available in basic calls depending on mapping)
             # Baostock growth data: YOYEquity, YOYAsset, YOYNI, YOYEPSBasic, YOYPNI
-            yoy_ni = float(g_df.iloc[0]['YOYNI'])
+            yoy_ni = float(g_row['YOYNI'])
             
             # Using YOYAsset as a proxy for scale expansion if Revenue YOY is not explicitly in this specific API subset or requires operation_data
             # Actually let's just use YOYNI > 20% for simplicity of this specific strategy if revenue is missing
@@ -94,7 +176,9 @@ class HighGrowthStrategy(StockStrategy):
             
         return False, {}
 
-class HighRoeStrategy(StockStrategy):
+class HighRoeStrategy(QuarterlyReportStrategy):
+    table = 'profit'
+
     @property
     def name(self):
         return "Quality_HighROE"
@@ -103,19 +187,18 @@ class HighRoeStrategy(StockStrategy):
     def description(self):
         return "High Quality: ROE > 15%"
         
-    def check(self, code, df):
+    def check(self, code, df, indicators=None):
         if df is None or len(df) < 1:
             return False, {}
             
         date_str = str(df.iloc[-1]['date'])
-        year, quarter = _get_report_period(date_str)
         
-        p_df = data_provider.get_profit_data(code, year, quarter)
-        if p_df is None or p_df.empty:
+        p_row, year, quarter = _get_report_row(self.table, code, date_str)
+        if p_row is None:
             return False, {}
             
         try:
-            roe = float(p_df.iloc[0]['roeAvg']) * 100 # usually it is decimal? wait baostock returns decimal or percent? Baostock usually returns decimal or percentage string. checking docs... assume it needs conversion or is direct value.
+            roe = float(p_row['roeAvg']) * 100 # usually it is decimal? wait baostock returns decimal or percent? Baostock usually returns decimal or percentage string. checking docs... assume it needs conversion or is direct value.
             # Baostock docs: roeAvg is usually decimal 0.15 for 15% or just verify.
             # If the value is > 1 it might be percentage.
             
@@ -144,7 +227,9 @@ class HighRoeStrategy(StockStrategy):
             
         return False, {}
 
-class LowDebtStrategy(StockStrategy):
+class LowDebtStrategy(QuarterlyReportStrategy):
+    table = 'balance'
+
     @property
     def name(self):
         return "Safety_LowDebt"
@@ -153,19 +238,18 @@ class LowDebtStrategy(StockStrategy):
     def description(self):
         return "Financial Health: Debt Ratio < 50%"
         
-    def check(self, code, df):
+    def check(self, code, df, indicators=None):
         if df is None or len(df) < 1:
             return False, {}
             
         date_str = str(df.iloc[-1]['date'])
-        year, quarter = _get_report_period(date_str)
         
-        b_df = data_provider.get_balance_data(code, year, quarter)
-        if b_df is None or b_df.empty:
+        b_row, year, quarter = _get_report_row(self.table, code, date_str)
+        if b_row is None:
             return False, {}
             
         try:
-            liab_ratio = float(b_df.iloc[0]['liabilityToAsset']) * 100 # It is ratio
+            liab_ratio = float(b_row['liabilityToAsset']) * 100 # It is ratio
             
             if liab_ratio < 50:
                  return True, {
@@ -1,6 +1,12 @@
 from .base import StockStrategy
+from core.indicators import StockIndicators
+import pandas as pd
 
 class MovingAverageStrategy(StockStrategy):
+    required_fields = ('date', 'close')
+    min_bars = 20
+    rolling_windows = (('close', 5), ('close', 20))
+
     @property
     def name(self):
         return "MA_Trend"
@@ -9,28 +15,58 @@ class MovingAverageStrategy(StockStrategy):
     def description(self):
         return "Moving Average Trend: Close > MA20 AND MA5 > MA20"
 
-    def check(self, code, df):
-        if df is None or len(df) < 20:
+    def check(self, code, df, indicators=None):
+        if df is None or len(df) < self.min_bars:
             return False, {}
             
-        df = df.copy() # Avoid SettingWithCopyWarning
-        df['MA5'] = df['close'].rolling(window=5).mean()
-        df['MA20'] = df['close'].rolling(window=20).mean()
-        
-        last_row = df.iloc[-1]
+        indicators = indicators or StockIndicators(df)
+        close = df['close'].iloc[-1]
+        ma5 = indicators.ma('close', 5).iloc[-1]
+        ma20 = indicators.ma('close', 20).iloc[-1]
         
-        condition_1 = last_row['close'] > last_row['MA20']
-        condition_2 = last_row['MA5'] > last_row['MA20']
+        condition_1 = close > ma20
+        condition_2 = ma5 > ma20
         
         if condition_1 and condition_2:
             return True, {
-                'price': last_row['close'],
-                'MA5': round(last_row['MA5'], 2),
-                'MA20': round(last_row['MA20'], 2)
+                'price': close,
+                'MA5': round(ma5, 2),
+                'MA20': round(ma20, 2)
             }
         return False, {}
 
+    def check_state(self, code, state):
+        if len(state) < self.min_bars:
+            return False, {}
+        close = state.last('close')
+        ma5 = state.mean('close', 5)
+        ma20 = state.mean('close', 20)
+        if close > ma20 and ma5 > ma20:
+            return True, {'price': close, 'MA5': round(ma5, 2), 'MA20': round(ma20, 2)}
+        return False, {}
+
+    def screen(self, panel):
+        close = panel['close']
+        # Mean of the last N rows equals rolling(N).mean() on the last row (NaN if any bar is missing)
+        last = close.iloc[-1]
+        ma5 = close.iloc[-5:].mean(skipna=False)
+        ma20 = close.iloc[-20:].mean(skipna=False)
+        mask = (last > ma20) & (ma5 > ma20)
+        details = pd.DataFrame({'price': last, 'MA5': ma5.round(2), 'MA20': ma20.round(2)})
+        return mask, details
+
+    def screen_range(self, panel):
+        close = panel['close']
+        ma5 = close.rolling(5).mean()
+        ma20 = close.rolling(20).mean()
+        mask = (close > ma20) & (ma5 > ma20)
+        return mask, {'price': close, 'MA5': ma5.round(2), 'MA20': ma20.round(2)}
+
 class VolumeRiseStrategy(StockStrategy):
+    required_fields = ('date', 'close', 'volume', 'pctChg')
+    min_bars = 6
+    rolling_windows = (('volume', 5),)
+
     @property
     def name(self):
         return "Volume_Breakout"
@@ -39,27 +75,60 @@ class VolumeRiseStrategy(StockStrategy):
     def description(self):
         return "Volume Breakout: Rise > 2% AND Volume > 1.5 * MA_VOL5"
 
-    def check(self, code, df):
-        if df is None or len(df) < 6:
+    def check(self, code, df, indicators=None):
+        if df is None or len(df) < self.min_bars:
             return False, {}
         
-        df = df.copy()
-        df['MA_VOL5'] = df['volume'].rolling(window=5).mean()
+        indicators = indicators or StockIndicators(df)
+        ma_vol5 = indicators.ma('volume', 5).iloc[-1]
         
         last_row = df.iloc[-1]
         
         is_up = last_row['pctChg'] > 2.0
-        is_volume_up = last_row['volume'] > (last_row['MA_VOL5'] * 1.5)
+        is_volume_up = last_row['volume'] > (ma_vol5 * 1.5)
         
         if is_up and is_volume_up:
             return True, {
                 'price': last_row['close'],
                 'pctChg': last_row['pctChg'],
-                'vol_ratio': round(last_row['volume'] / last_row['MA_VOL5'], 2)
+                'vol_ratio': round(last_row['volume'] / ma_vol5, 2)
             }
         return False, {}
 
+    def check_state(self, code, state):
+        if len(state) < self.min_bars:
+            return False, {}
+        volume = state.last('volume')
+        ma_vol5 = state.mean('volume', 5)
+        pct_chg = state.last('pctChg')
+        if pct_chg > 2.0 and volume > ma_vol5 * 1.5:
+            return True, {'price': state.last('close'), 'pctChg': pct_chg, 'vol_ratio': round(volume / ma_vol5, 2)}
+        return False, {}
+
+    def screen(self, panel):
+        volume = panel['volume']
+        last_vol = volume.iloc[-1]
+        ma_vol5 = volume.iloc[-5:].mean(skipna=False)
+        pct_chg = panel['pctChg'].iloc[-1]
+        mask = (pct_chg > 2.0) & (last_vol > ma_vol5 * 1.5)
+        details = pd.DataFrame({
+            'price': panel['close'].iloc[-1],
+            'pctChg': pct_chg,
+            'vol_ratio': (last_vol / ma_vol5).round(2)
+        })
+        return mask, details
+
+    def screen_range(self, panel):
+        volume = panel['volume']
+        ma_vol5 = volume.rolling(5).mean()
+        pct_chg = panel['pctChg']
+        mask = (pct_chg > 2.0) & (volume > ma_vol5 * 1.5)
+        return mask, {'price': panel['close'], 'pctChg': pct_chg, 'vol_ratio': (volume / ma_vol5).round(2)}
+
 class HighTurnoverStrategy(StockStrategy):
+    required_fields = ('date', 'close', 'turn', 'isST', 'pctChg')
+    min_bars = 1
+
     @property
     def name(self):
         return "High_Turnover"
@@ -68,7 +137,7 @@ class HighTurnoverStrategy(StockStrategy):
     def description(self):
         return "High Turnover: Turnover > 5% AND Not ST"
         
-    def check(self, code, df):
+    def check(self, code, df, indicators=None):
         if df is None or len(df) < 1:
             return False, {}
             
@@ -83,3 +152,27 @@ class HighTurnoverStrategy(StockStrategy):
                 'pctChg': round(last_row.get('pctChg', 0), 2)
             }
         return False, {}
+
+    def check_state(self, code, state):
+        if len(state) < 1:
+            return False, {}
+        turn = state.last('turn')
+        if turn > 5 and str(state.last('isST')) != '1':
+            return True, {'price': state.last('close'), 'turn': round(turn, 2), 'pctChg': round(state.last('pctChg'), 2)}
+        return False, {}
+
+    def screen(self, panel):
+        turn = panel['turn'].iloc[-1]
+        is_st = panel['isST'].iloc[-1].astype(str)
+        mask = (turn > 5) & (is_st != '1')
+        details = pd.DataFrame({
+            'price': panel['close'].iloc[-1],
+            'turn': turn.round(2),
+            'pctChg': panel['pctChg'].iloc[-1].round(2)
+        })
+        return mask, details
+
+    def screen_range(self, panel):
+        turn = panel['turn']
+        mask = (turn > 5) & (panel['isST'].astype(str) != '1')
+        return mask, {'price': panel['close'], 'turn': turn.round(2), 'pctChg': panel['pctChg'].round(2)}
@@ -30,3 +30,125 @@ def save_results_to_csv(results, filename):
     
     df.to_csv(filename, index=False)
     print(f"\nResults saved to: {filename}")
+
+def get_cache_dir(*parts):
+    """
+    Return (and create) a directory under the local data cache.
+    The root defaults to '.omnialpha_cache' and can be moved with OMNIALPHA_CACHE_DIR.
+    """
+    root = os.environ.get('OMNIALPHA_CACHE_DIR', '.omnialpha_cache')
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def json_default(value):
+    """json.dump default= hook for numpy scalars found in result details."""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+def _result_columns(columns):
+    """date, code, strategy first, then the rest in order of appearance."""
+    head = [c for c in ('date', 'code', 'strategy') if c in columns]
+    return head + [c for c in columns if c not in head]
+
+def _promote_type(old, new):
+    """Arrow type that can hold values of both types: null -> other, numeric -> float64, else string."""
+    import pyarrow as pa
+
+    if old.equals(new) or pa.types.is_null(new):
+        return old
+    if pa.types.is_null(old):
+        return new
+    numeric = lambda t: pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_boolean(t)
+    if numeric(old) and numeric(new):
+        return pa.float64()
+    return pa.string()
+
+def _cast_table(table, schema):
+    """Cast a table to schema, adding all-null columns for fields it lacks."""
+    import pyarrow as pa
+
+    return pa.table({f.name: table[f.name].cast(f.type) if f.name in table.column_names
+                     else pa.nulls(len(table), f.type) for f in schema}, schema=schema)
+
+class ResultWriter:
+    """
+    Append analysis results to a CSV or Parquet file while a scan is running.
+    
+    Rows are buffered and written in row groups, so only the current group is held
+    in memory. Columns are the union of all result keys; when a later row brings a
+    new column (another strategy's details), the rows written so far are rewritten
+    once with the wider header.
+    """
+    def __init__(self, filename, row_group_size=500):
+        self.filename = filename
+        self.format = 'parquet' if filename.endswith('.parquet') else 'csv'
+        self.row_group_size = row_group_size
+        self.columns = []
+        self.rows_written = 0
+        self._buffer = []
+        self._parquet_writer = None
+
+    def write(self, results):
+        """Queue result dicts; a row group is written once enough are buffered."""
+        self._buffer.extend(results)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        df = pd.DataFrame(self._buffer)
+        self._buffer = []
+        
+        new_cols = [c for c in df.columns if c not in self.columns]
+        if new_cols:
+            self.columns = _result_columns(self.columns + new_cols)
+        df = df.reindex(columns=self.columns)
+        
+        if self.format == 'csv':
+            if new_cols and self.rows_written:
+                self._widen_csv()
+            first = self.rows_written == 0
+            df.to_csv(self.filename, mode='w' if first else 'a', header=first, index=False)
+        else:
+            self._write_parquet(df, widen=bool(new_cols) and self.rows_written > 0)
+        self.rows_written += len(df)
+
+    def _widen_csv(self):
+        # Read back as text so the rows already written are reproduced exactly
+        old = pd.read_csv(self.filename, dtype=str, keep_default_na=False)
+        old.reindex(columns=self.columns).to_csv(self.filename, index=False)
+
+    def _write_parquet(self, df, widen):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.filename, table.schema)
+            self._parquet_writer.write_table(table)
+            return
+        
+        old_schema = self._parquet_writer.schema
+        schema = pa.schema([pa.field(c, _promote_type(
+            old_schema.field(c).type if c in old_schema.names else pa.null(),
+            # A column with no values in this group says nothing about its type
+            pa.null() if table[c].null_count == len(table) else table.schema.field(c).type))
+            for c in self.columns])
+        if widen or not schema.equals(old_schema):
+            # A Parquet file has one schema: rewrite what was written with new columns added
+            # and types promoted (e.g. null -> double, int64 -> double)
+            self._parquet_writer.close()
+            old = pq.read_table(self.filename)
+            old = _cast_table(old, schema)
+            self._parquet_writer = pq.ParquetWriter(self.filename, schema)
+            self._parquet_writer.write_table(old)
+        self._parquet_writer.write_table(_cast_table(table, schema))
+
+    def close(self):
+        self.flush()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
@@ -3,9 +3,16 @@ import pandas as pd
 import altair as alt
 import datetime
 import time
+import os
+import json
 from core.data_provider import data_provider
 from core.engine import AnalysisEngine
+from core.checkpoint import ScanCheckpoint
+from core.indicators import indicator_cache
+from core.result_cache import result_cache
+from core.profiler import Profiler
 from strategies import get_strategy, get_all_strategy_keys
+from utils.file_io import ResultWriter, get_cache_dir
 
 # Page Config
 st.set_page_config(
@@ -26,6 +33,15 @@ if 'current_index' not in st.session_state:
     st.session_state.current_index = 0
 if 'progress_text' not in st.session_state:
     st.session_state.progress_text = "准备就绪"
+if 'strategy_stats' not in st.session_state:
+    st.session_state.strategy_stats = {}
+if 'result_writer' not in st.session_state:
+    st.session_state.result_writer = None
+if 'checkpoint' not in st.session_state:
+    st.session_state.checkpoint = None
+if 'profiler' not in st.session_state:
+    # Each browser session profiles into its own instance, activated around its scan batches
+    st.session_state.profiler = Profiler()
 
 # Title and Intro
 st.title("📈 OmniAlpha 智能选股工作台")
@@ -37,8 +53,8 @@ st.markdown("""
 # --- Sidebar Configuration ---
 st.sidebar.header("⚙️ 参数配置")
 
-# 1. Date Selection
-default_date = datetime.date.today()
+# 1. Date Selection (defaults to the latest trading day from the cached calendar)
+default_date = datetime.datetime.strptime(data_provider.get_latest_trading_date(), "%Y-%m-%d").date()
 selected_date = st.sidebar.date_input("📅 分析日期 (回测/复盘)", default_date)
 date_str = selected_date.strftime("%Y-%m-%d")
 
@@ -72,6 +88,9 @@ data_source_mode = st.sidebar.radio(
     "股票池来源",
     ("沪深300 (默认)", "CSV 文件导入", "快速测试 (前20只)")
 )
+resume_scan = st.sidebar.checkbox("⏯ 从断点继续 (相同股票池/策略/日期)", value=True)
+profile_scan = st.sidebar.checkbox("⏱ 性能剖析 (记录取数/解析/策略耗时)", value=False)
+st.session_state.profiler.enable(profile_scan)
 
 with st.sidebar.expander("🛠 制作自定义股票池 CSV"):
     st.caption("输入代码用分号 ';' 隔开，如: sh.600000;sz.000001")
@@ -186,6 +205,20 @@ if start_btn:
             st.session_state.stock_pool = pool
             st.session_state.current_index = 0
             st.session_state.analysis_results = [] # Reset results
+            st.session_state.strategy_stats = {} # Reset per-strategy cost / pass-rate stats
+            st.session_state.profiler.reset()
+            # Persist results batch by batch so a long scan keeps its partial output on disk
+            st.session_state.result_writer = ResultWriter(
+                os.path.join(get_cache_dir('results'), f"omnialpha_selection_{date_str}.csv"))
+            # Checkpoint so a crashed or closed session can pick up where it stopped
+            checkpoint = ScanCheckpoint(pool, [get_strategy(k) for k in selected_strategy_keys], date_str, logic='and')
+            if resume_scan and checkpoint.load():
+                # Batches run in pool order, so the processed codes are a prefix of the pool
+                while st.session_state.current_index < len(pool) and pool[st.session_state.current_index] in checkpoint.processed:
+                    st.session_state.current_index += 1
+                st.session_state.analysis_results = list(checkpoint.results)
+                st.session_state.result_writer.write(checkpoint.results)
+            st.session_state.checkpoint = checkpoint
             st.session_state.is_running = True
             st.session_state.progress_text = "开始扫描..."
             st.rerun()
@@ -196,6 +229,10 @@ if start_btn:
 # --- Stop Logic ---
 if stop_btn:
     st.session_state.is_running = False
+    if st.session_state.result_writer is not None:
+        st.session_state.result_writer.close()
+    if st.session_state.checkpoint is not None:
+        st.session_state.checkpoint.save()
     st.session_state.progress_text = "已手动停止分析"
     st.rerun()
 
@@ -207,31 +244,60 @@ if st.session_state.is_running:
     
     # Init Engine
     strategies = [get_strategy(k) for k in selected_strategy_keys]
-    engine = AnalysisEngine(strategies)
+    # Stats live in the session so strategy ordering keeps adapting across reruns
+    engine = AnalysisEngine(strategies, stats=st.session_state.strategy_stats, indicators=indicator_cache,
+                            result_cache=result_cache)
     
     # Show Progress Bar
     progress_val = min(idx / total, 1.0)
     st.progress(progress_val)
     st.info(f"正在扫描: {idx}/{total} ({int(progress_val*100)}%) - {st.session_state.progress_text}")
+    
+    # Partial results so far
+    if st.session_state.analysis_results:
+        st.caption(f"已筛选出 {len(st.session_state.analysis_results)} 只股票 (扫描中)")
+        st.dataframe(pd.DataFrame(st.session_state.analysis_results), use_container_width=True)
 
     # Process a Batch (e.g., 5 stocks)
     BATCH_SIZE = 5
     end_idx = min(idx + BATCH_SIZE, total)
     
     try:
-        data_provider.login()
+        # Timings go to this session's profiler, not to other sessions running in the process
+        with st.session_state.profiler.activate():
+            data_provider.login()
+            
+            # Preload pool-wide data (quarterly snapshots) once; later reruns hit memory
+            engine.prepare(pool, date_str)
+            
+            batch_results = []
+            for i in range(idx, end_idx):
+                code = pool[i]
+                res = engine.scan_one(code, date_str)
+                if res:
+                    batch_results.append(res)
+        st.session_state.analysis_results.extend(batch_results)
         
-        for i in range(idx, end_idx):
-            code = pool[i]
-            res = engine.scan_one(code, date_str)
-            if res:
-                st.session_state.analysis_results.append(res)
+        writer = st.session_state.result_writer
+        if writer is not None:
+            writer.write(batch_results)
+            writer.flush()
+        checkpoint = st.session_state.checkpoint
+        if checkpoint is not None:
+            checkpoint.update(pool[idx:end_idx], batch_results)
+            checkpoint.maybe_save()
+        result_cache.maybe_flush()
         
         # Update State
         st.session_state.current_index = end_idx
         
         if end_idx >= total:
             st.session_state.is_running = False
+            if writer is not None:
+                writer.close()
+            if checkpoint is not None:
+                checkpoint.clear()
+            result_cache.flush()
             st.session_state.progress_text = "分析完成！"
             st.rerun()
         else:
@@ -242,6 +308,8 @@ if st.session_state.is_running:
     except Exception as e:
         st.error(f"运行时错误: {e}")
         st.session_state.is_running = False
+        if st.session_state.checkpoint is not None:
+            st.session_state.checkpoint.save()
 
 # --- Result Display ---
 if st.session_state.analysis_results is not None and not st.session_state.is_running:
@@ -259,6 +327,28 @@ if st.session_state.analysis_results is not None and not st.session_state.is_run
         # Interactive Table
         st.dataframe(df_results, use_container_width=True)
         
+        if st.session_state.strategy_stats:
+            with st.expander("⏱️ 策略耗时与通过率 (按执行顺序)"):
+                strategies = [get_strategy(k) for k in selected_strategy_keys]
+                stats_engine = AnalysisEngine(strategies, stats=st.session_state.strategy_stats)
+                st.dataframe(pd.DataFrame(stats_engine.summary()), use_container_width=True)
+        
+        if profile_scan:
+            with st.expander("🔬 性能剖析 (各阶段耗时 / 缓存命中)"):
+                strategies = [get_strategy(k) for k in selected_strategy_keys]
+                stats_engine = AnalysisEngine(strategies, stats=st.session_state.strategy_stats)
+                report = st.session_state.profiler.report(stats_engine.summary())
+                if report['timers']:
+                    st.dataframe(pd.DataFrame.from_dict(report['timers'], orient='index'), use_container_width=True)
+                if report['counters']:
+                    st.dataframe(pd.Series(report['counters'], name='count'), use_container_width=True)
+                st.download_button(
+                    label="📥 下载剖析报告 JSON",
+                    data=json.dumps(report, ensure_ascii=False, indent=2).encode('utf-8'),
+                    file_name=f"omnialpha_profile_{date_str}.json",
+                    mime='application/json',
+                )
+        
         # Download
         csv = df_results.to_csv(index=False).encode('utf-8')
         st.download_button(
@@ -390,17 +480,15 @@ if st.session_state.analysis_results is not None and not st.session_state.is_run
                     
                     st.divider()
 
-                    # --- Indicator Calculation ---
-                    df_k['MA5'] = df_k['close'].rolling(window=5).mean()
-                    df_k['MA20'] = df_k['close'].rolling(window=20).mean()
-                    df_k['MA60'] = df_k['close'].rolling(window=60).mean()
+                    # --- Indicator Calculation (memoized per stock across reruns) ---
+                    indicators = indicator_cache.get(selected_stock, df_k)
+                    df_k = df_k.copy()
+                    df_k['MA5'] = indicators.ma('close', 5)
+                    df_k['MA20'] = indicators.ma('close', 20)
+                    df_k['MA60'] = indicators.ma('close', 60)
                     
-                    # RSI Calculation (Simple 14-day)
-                    delta = df_k['close'].diff()
-                    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                    rs = gain / loss
-                    df_k['RSI'] = 100 - (100 / (1 + rs))
+                    # RSI (Simple 14-day)
+                    df_k['RSI'] = indicators.rsi(14)
                     
                     # Fill NaN for plotting
                     df_plot = df_k.tail(100).fillna(0) # Show last 100 days